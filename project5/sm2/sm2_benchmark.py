@@ -0,0 +1,264 @@
+import argparse
+import itertools
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+import sm3_backend
+from sm2_field import SM2PrimeField
+from sm2_implementation import SM2
+from sm2_optimized import OptimizedSM2
+
+# 每个用例: (名称, 构造被测函数的工厂, 采样次数, 每个样本内的调用次数)
+# 单次耗时在百纳秒量级的域运算用较大的内层循环，摊薄计时本身的开销
+BenchmarkCase = Tuple[str, Callable[[], Callable[[], object]], int, int]
+
+INPUT_POOL_SIZE = 64
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """最近秩百分位数（sorted_samples 已升序）"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def measure(func: Callable[[], object], iterations: int, warmup: int, inner: int = 1) -> dict:
+    """预热后逐样本计时（perf_counter_ns），返回单次调用的延迟分布（纳秒）与吞吐量"""
+    for _ in range(warmup * inner):
+        func()
+
+    samples = []
+    loop = range(inner)
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        for _ in loop:
+            func()
+        samples.append((time.perf_counter_ns() - start) / inner)
+
+    samples.sort()
+    mean = statistics.fmean(samples)
+    return {
+        "iterations": iterations,
+        "inner": inner,
+        "warmup": warmup,
+        "mean_ns": mean,
+        "stdev_ns": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "min_ns": samples[0],
+        "p50_ns": percentile(samples, 50),
+        "p90_ns": percentile(samples, 90),
+        "p99_ns": percentile(samples, 99),
+        "max_ns": samples[-1],
+        "ops_per_sec": 1e9 / mean if mean else 0.0,
+    }
+
+
+def _cycling(values: list) -> Callable[[], object]:
+    """循环取预先生成的输入，避免把随机数生成计入耗时"""
+    return itertools.cycle(values).__next__
+
+
+def build_cases(seed: int = 2024) -> List[BenchmarkCase]:
+    """构造全部基准测试用例（输入在工厂中惰性生成，只为被选中的用例付出准备开销）"""
+    rng = random.Random(seed)
+    basic = SM2()
+    opt = OptimizedSM2()
+    opt_comb = OptimizedSM2(secret_scalar_method="comb")
+    field = SM2PrimeField()
+    n, p = opt.N, opt.P
+    message = b"Performance test message"
+
+    def scalars() -> List[int]:
+        return [rng.randrange(1, n) for _ in range(INPUT_POOL_SIZE)]
+
+    def random_point():
+        return opt.point_multiply_precomputed(rng.randrange(1, n))
+
+    def keygen_basic():
+        return basic.generate_keypair
+
+    def keygen_optimized():
+        return opt.generate_keypair_secure
+
+    def sign_basic():
+        d, _ = basic.generate_keypair()
+        return lambda: basic.sign(message, d)
+
+    def sign_optimized():
+        d, _ = opt.generate_keypair_secure()
+        return lambda: opt.sign_optimized(message, d)
+
+    def sign_optimized_comb():
+        d, _ = opt_comb.generate_keypair_secure()
+        return lambda: opt_comb.sign_optimized(message, d)
+
+    def verify_basic():
+        d, pub = basic.generate_keypair()
+        sig = basic.sign(message, d)
+        return lambda: basic.verify(message, sig, pub)
+
+    def verify_optimized():
+        d, pub = opt.generate_keypair_secure()
+        sig = opt.sign_optimized(message, d)
+        return lambda: opt.verify_optimized(message, sig, pub)
+
+    def scalar_windowed():
+        P, k = random_point(), _cycling(scalars())
+        return lambda: opt.point_multiply_windowed(k(), P)
+
+    def scalar_precomputed():
+        k = _cycling(scalars())
+        return lambda: opt.point_multiply_precomputed(k())
+
+    def scalar_ladder():
+        P, k = random_point(), _cycling(scalars())
+        return lambda: opt.montgomery_ladder(k(), P)
+
+    def scalar_simultaneous():
+        P, k1, k2 = random_point(), _cycling(scalars()), _cycling(scalars())
+        return lambda: opt.simultaneous_multiply(k1(), opt.G, k2(), P)
+
+    def scalar_basic():
+        P, k = random_point(), _cycling(scalars())
+        return lambda: basic.point_multiply(k(), P)
+
+    def field_operands():
+        return rng.randrange(1, p), rng.randrange(1, p)
+
+    def field_mul():
+        a, b = field_operands()
+        return lambda: field.mul(a, b)
+
+    def field_mul_solinas():
+        a, b = field_operands()
+        return lambda: field.mul_solinas(a, b)
+
+    def field_sqr():
+        a, _ = field_operands()
+        return lambda: field.sqr(a)
+
+    def field_inv():
+        a, _ = field_operands()
+        return lambda: field.inv(a)
+
+    def field_sqrt():
+        x = opt.G[1] * opt.G[1] % p
+        return lambda: field.sqrt(x)
+
+    def hash_sm3():
+        data = bytes(rng.getrandbits(8) for _ in range(256))
+        return lambda: sm3_backend.sm3_hash(data)
+
+    return [
+        ("keygen.basic", keygen_basic, 50, 1),
+        ("keygen.optimized", keygen_optimized, 200, 1),
+        ("sign.basic", sign_basic, 50, 1),
+        ("sign.optimized", sign_optimized, 200, 1),
+        ("sign.optimized_comb", sign_optimized_comb, 200, 1),
+        ("verify.basic", verify_basic, 50, 1),
+        ("verify.optimized", verify_optimized, 200, 1),
+        ("scalar.basic", scalar_basic, 50, 1),
+        ("scalar.windowed", scalar_windowed, 100, 1),
+        ("scalar.precomputed", scalar_precomputed, 200, 1),
+        ("scalar.montgomery_ladder", scalar_ladder, 100, 1),
+        ("scalar.simultaneous", scalar_simultaneous, 100, 1),
+        ("field.mul", field_mul, 200, 1000),
+        ("field.mul_solinas", field_mul_solinas, 200, 1000),
+        ("field.sqr", field_sqr, 200, 1000),
+        ("field.inv", field_inv, 200, 100),
+        ("field.sqrt", field_sqrt, 200, 10),
+        ("hash.sm3_256B", hash_sm3, 200, 100),
+    ]
+
+
+def run_benchmarks(pattern: Optional[str] = None, scale: float = 1.0,
+                   warmup: int = 5, verbose: bool = True) -> dict:
+    """运行名称包含 pattern 的用例，scale 按比例缩放采样次数"""
+    results = {}
+    for name, factory, iterations, inner in build_cases():
+        if pattern and pattern not in name:
+            continue
+        func = factory()
+        stats = measure(func, max(2, int(iterations * scale)), warmup, inner)
+        results[name] = stats
+        if verbose:
+            print(f"{name:<26} p50 {stats['p50_ns'] / 1e3:>11.2f} us   p99 {stats['p99_ns'] / 1e3:>11.2f} us"
+                  f"   {stats['ops_per_sec']:>14.1f} ops/s")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "sm3_backend": sm3_backend.get_backend(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare_results(current: dict, baseline: dict, threshold: float = 0.10) -> List[dict]:
+    """按中位数延迟与基线比较，变慢超过 threshold 的用例标记为回归"""
+    rows = []
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        ratio = stats["p50_ns"] / base["p50_ns"] if base["p50_ns"] else float("inf")
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 - threshold:
+            status = "improvement"
+        else:
+            status = "unchanged"
+        rows.append({"name": name, "baseline_p50_ns": base["p50_ns"], "current_p50_ns": stats["p50_ns"],
+                     "ratio": ratio, "status": status})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="SM2性能基准测试")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的用例，如 sign、scalar.、field.")
+    parser.add_argument("--scale", type=float, default=1.0, help="采样次数缩放系数")
+    parser.add_argument("--quick", action="store_true", help="快速模式（采样次数缩小为1/10）")
+    parser.add_argument("--warmup", type=int, default=5, help="每个用例的预热次数")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    parser.add_argument("--compare", help="与基线JSON文件比较")
+    parser.add_argument("--threshold", type=float, default=0.10, help="判定回归的相对阈值")
+    args = parser.parse_args(argv)
+
+    scale = args.scale * (0.1 if args.quick else 1.0)
+    print("=" * 60)
+    print("SM2算法性能基准测试")
+    print("=" * 60)
+    report = run_benchmarks(args.filter, scale, args.warmup)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"结果已写入 {args.output}")
+
+    if not args.compare:
+        return 0
+
+    with open(args.compare, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare_results(report, baseline, args.threshold)
+    print()
+    print(f"与基线 {args.compare} 比较（阈值 {args.threshold:.0%}）")
+    for row in rows:
+        flag = "  <-- 回归" if row["status"] == "regression" else ""
+        print(f"{row['name']:<26} {row['baseline_p50_ns'] / 1e3:>11.2f} us -> "
+              f"{row['current_p50_ns'] / 1e3:>11.2f} us   x{row['ratio']:.2f}{flag}")
+    regressions = [row for row in rows if row["status"] == "regression"]
+    print(f"回归用例数: {len(regressions)}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import hashlib
+from typing import Dict, NamedTuple, Tuple
+
+
+class CurveParams(NamedTuple):
+    """素域椭圆曲线 y^2 = x^3 + ax + b (mod p) 的参数，G 为n阶基点（余因子为1）"""
+
+    name: str
+    p: int
+    a: int
+    b: int
+    gx: int
+    gy: int
+    n: int
+
+    @property
+    def generator(self) -> Tuple[int, int]:
+        return (self.gx, self.gy)
+
+    @property
+    def coord_size(self) -> int:
+        """坐标编码长度（字节）"""
+        return (self.p.bit_length() + 7) // 8
+
+    def fingerprint(self) -> bytes:
+        """曲线参数指纹，防止加载其他曲线的预计算表"""
+        size = self.coord_size
+        params = (self.p, self.a, self.b, self.gx, self.gy, self.n)
+        return hashlib.sha256(b"".join(v.to_bytes(size, 'big') for v in params)).digest()
+
+
+# SM2推荐曲线（GB/T 32918.5）
+SM2_RECOMMENDED = CurveParams(
+    name="sm2p256v1",
+    p=0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF,
+    a=0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFC,
+    b=0x28E9FA9E9D9F5E344D5A9E4BCF6509A7F39789F515AB8F92DDBCBD414D940E93,
+    gx=0x32C4AE2C1F1981195F9904466A39C9948FE30BBFF2660BE1715A4589334C74C7,
+    gy=0xBC3736A2F4F6779C59BDCEE36B692153D0A9877CC62A474002DF32E52139F0A0,
+    n=0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFF7203DF6B21C6052B53BBF40939D54123,
+)
+
+# GB/T 32918 示例使用的256位测试曲线（zbc.py、sm2_poc.py）
+SM2_TEST_CURVE = CurveParams(
+    name="sm2-test-256",
+    p=0x8542D69E4C044F18E8B92435BF6FF7DE457283915C45517D722EDB8B08F1DFC3,
+    a=0x787968B4FA32C3FD2417842E73BBFEFF2F3C848B6831D7E0EC65228B3937E498,
+    b=0x63E4C6D3B23B0C849CF84241484BFE48F61D59A5B16BA06E6E12D1DA27C5249A,
+    gx=0x421DEBD61B62EAB6746434EBC3CC315E32220B3BADD50BDC4C4E6C147FEDD43D,
+    gy=0x0680512BCBB42C07D47349D2153B70C4E5D7FDFCBFA36EA1A85841B9E46E09A2,
+    n=0x8542D69E4C044F18E8B92435BF6FF7DD297720630485628D5AE74EE7C32E79B7,
+)
+
+CURVES: Dict[str, CurveParams] = {curve.name: curve for curve in (SM2_RECOMMENDED, SM2_TEST_CURVE)}
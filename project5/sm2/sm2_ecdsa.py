@@ -0,0 +1,173 @@
+import hashlib
+import random
+from typing import List, Optional, Tuple
+
+from sm2_curve import CurveParams, SM2_RECOMMENDED
+from sm2_memo import LRUCache
+from sm2_optimized import OptimizedSM2
+
+
+def batch_inverse(values: List[int], modulus: int) -> List[int]:
+    """批量模逆（Montgomery技巧：n个值共用一次模逆），values 中不能有0"""
+    prefix = []
+    acc = 1
+    for value in values:
+        acc = acc * value % modulus
+        prefix.append(acc)
+    if not values:
+        return []
+    if acc == 0:
+        raise ValueError("批量求逆的输入包含0")
+
+    inv = pow(acc, -1, modulus)
+    result = [0] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        result[i] = inv * prefix[i - 1] % modulus
+        inv = inv * values[i] % modulus
+    result[0] = inv
+    return result
+
+
+class ECDSAEngine:
+    """与 OptimizedSM2 共用曲线参数与点运算的ECDSA
+
+    用于SM2/ECDSA混合语料的随机数重用审计（见 sm2_poc/nonce_audit.py）：
+    签名的 kG 走 OptimizedSM2 的秘密标量点乘，未传入 sm2 时自建 secret_scalar_method="comb" 的引擎，
+    使用基点预计算表（每个非零窗口一次混合加法，无点倍运算），传入 sm2 时沿用其设置；
+    验签的 u1*G + u2*Q 使用基点wNAF表与缓存的公钥奇数倍点表做交错wNAF，
+    结果在Jacobian坐标下与r比较，不做坐标转换的模逆；批量签名/验签时所有 k 或 s 共用一次模逆。
+    """
+
+    def __init__(self, curve: CurveParams = SM2_RECOMMENDED, sm2: Optional[OptimizedSM2] = None,
+                 hash_name: str = "sha256", pubkey_cache_size: int = 4096):
+        self.sm2 = sm2 if sm2 is not None else OptimizedSM2(curve=curve, secret_scalar_method="comb")
+        self.curve = self.sm2.curve
+        self.N = self.sm2.N
+        self.P = self.sm2.P
+        self.hash_name = hash_name
+        hashlib.new(hash_name)
+        # 公钥 -> 奇数倍点表（公钥不合法时为None）
+        self.pubkey_cache = LRUCache(pubkey_cache_size)
+
+    def hash_to_int(self, message: bytes) -> int:
+        """e = 摘要的最左 bitlen(n) 位，再模n"""
+        digest = hashlib.new(self.hash_name, message).digest()
+        e = int.from_bytes(digest, 'big')
+        excess = len(digest) * 8 - self.N.bit_length()
+        if excess > 0:
+            e >>= excess
+        return e % self.N
+
+    def sign(self, message: bytes, private_key: int, k: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """ECDSA签名；指定 k 时按给定随机数签名，r 或 s 为0时返回None"""
+        return self.sign_digest(self.hash_to_int(message), private_key, k)
+
+    def sign_digest(self, e: int, private_key: int, k: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """对已截断的摘要整数 e 签名: r = x(kG) mod n, s = k^-1 (e + r d)"""
+        while True:
+            nonce = k if k is not None else random.SystemRandom().randint(1, self.N - 1)
+            point = self.sm2._secret_base_multiply(nonce % self.N)
+            signature = None
+            if point is not None:
+                signature = self._finish_signature(e, private_key, nonce, point[0], pow(nonce, -1, self.N))
+            if signature is not None or k is not None:
+                return signature
+
+    def sign_many(self, messages: List[bytes], private_key: int,
+                  nonces: Optional[List[int]] = None) -> List[Optional[Tuple[int, int]]]:
+        """批量签名：所有 kG 共用一次坐标转换模逆，所有 k^-1 共用一次标量模逆
+
+        nonces 未指定时随机生成（个别无效签名单独重签）；指定时与 sign(..., k) 相同，无效签名为None。
+        """
+        n = self.N
+        fixed = nonces is not None
+        if fixed:
+            if len(nonces) != len(messages):
+                raise ValueError("随机数与消息的数量不一致")
+            nonces = [k % n for k in nonces]
+        else:
+            rng = random.SystemRandom()
+            nonces = [rng.randint(1, n - 1) for _ in messages]
+
+        points = self.sm2._batch_to_affine([self.sm2._secret_base_multiply_jacobian(k) for k in nonces])
+        usable = [i for i, point in enumerate(points) if point is not None]
+        inverses = dict(zip(usable, batch_inverse([nonces[i] for i in usable], n)))
+
+        signatures = []
+        for i, message in enumerate(messages):
+            e = self.hash_to_int(message)
+            signature = None
+            if i in inverses:
+                signature = self._finish_signature(e, private_key, nonces[i], points[i][0], inverses[i])
+            if signature is None and not fixed:
+                signature = self.sign_digest(e, private_key)
+            signatures.append(signature)
+        return signatures
+
+    def _finish_signature(self, e: int, private_key: int, k: int, x1: int,
+                          k_inv: int) -> Optional[Tuple[int, int]]:
+        r = x1 % self.N
+        if r == 0:
+            return None
+        s = k_inv * (e + r * private_key) % self.N
+        if s == 0:
+            return None
+        return (r, s)
+
+    def _pubkey_table(self, public_key: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        """公钥的奇数倍点表（带缓存），公钥不在曲线上时返回None"""
+        public_key = tuple(public_key)
+        table = self.pubkey_cache.get(public_key, False)
+        if table is not False:
+            return table
+        table = None
+        if self.sm2.is_on_curve(public_key):
+            sm2 = self.sm2
+            table = sm2._batch_to_affine(sm2._compute_odd_multiples(public_key, sm2.PUBKEY_WNAF_WIDTH - 1))
+        self.pubkey_cache.put(public_key, table)
+        return table
+
+    def verify(self, message: bytes, signature: Tuple[int, int], public_key: Tuple[int, int]) -> bool:
+        """ECDSA验签"""
+        r, s = signature
+        if not (1 <= r < self.N and 1 <= s < self.N):
+            return False
+        return self._verify_with_inverse(self.hash_to_int(message), r, pow(s, -1, self.N), public_key)
+
+    def _verify_with_inverse(self, e: int, r: int, w: int, public_key: Tuple[int, int]) -> bool:
+        """已知 w = s^-1 时验签: x(u1*G + u2*Q) mod n == r"""
+        table = self._pubkey_table(public_key)
+        if table is None:
+            return False
+        sm2 = self.sm2
+        point = sm2._interleaved_wnaf_jacobian([
+            (e * w % self.N, sm2._get_generator_wnaf_table(sm2.G_WNAF_WIDTH), sm2.G_WNAF_WIDTH),
+            (r * w % self.N, table, sm2.PUBKEY_WNAF_WIDTH)
+        ])
+        if point is None:
+            return False
+
+        # x = X/Z^2，x mod n == r 等价于 X == r*Z^2 或 X == (r+n)*Z^2 (mod p，后者仅当 r+n < p)
+        X, _, Z = point
+        z2 = Z * Z % self.P
+        if (X - r * z2) % self.P == 0:
+            return True
+        return r + self.N < self.P and (X - (r + self.N) * z2) % self.P == 0
+
+    def verify_batch(self, items: List[tuple]) -> List[bool]:
+        """批量验签，items 中每项为 (message, signature, public_key)，返回逐项的验证结果
+
+        所有 s 共用一次模逆；ECDSA的r不确定R的y坐标，无法像SM2那样合并为一个随机线性组合，
+        因此仍逐项计算 u1*G + u2*Q，但每项都不需要模逆。
+        """
+        results = [False] * len(items)
+        candidates = []
+        for i, (message, signature, public_key) in enumerate(items):
+            r, s = signature
+            if 1 <= r < self.N and 1 <= s < self.N:
+                candidates.append((i, message, r, s, public_key))
+
+        inverses = batch_inverse([s for _, _, _, s, _ in candidates], self.N)
+        for (i, message, r, _, public_key), w in zip(candidates, inverses):
+            results[i] = self._verify_with_inverse(self.hash_to_int(message), r, w, public_key)
+        return results
@@ -0,0 +1,163 @@
+import random
+import time
+from typing import Optional
+
+
+class PrimeField:
+    """素域 GF(p) 运算"""
+
+    def __init__(self, p: int):
+        self.p = p
+
+    def reduce(self, x: int) -> int:
+        """模约简 x mod p"""
+        return x % self.p
+
+    def mul(self, a: int, b: int) -> int:
+        """模乘 a*b mod p"""
+        return a * b % self.p
+
+    def sqr(self, a: int) -> int:
+        """模平方 a^2 mod p"""
+        return a * a % self.p
+
+    def inv(self, a: int) -> int:
+        """模逆（CPython内置的扩展欧几里得，比费马小定理 a^(p-2) 快数倍）"""
+        if a % self.p == 0:
+            raise ValueError("模逆不存在")
+        return pow(a, -1, self.p)
+
+    def sqrt(self, a: int) -> Optional[int]:
+        """模平方根（要求 p ≡ 3 mod 4: sqrt(a) = a^((p+1)/4)），不存在时返回None"""
+        root = pow(a, (self.p + 1) // 4, self.p)
+        if root * root % self.p != a % self.p:
+            return None
+        return root
+
+
+class SM2PrimeField(PrimeField):
+    """SM2推荐曲线素域，p = 2^256 - 2^224 - 2^96 + 2^64 - 1
+
+    利用 2^256 ≡ 2^224 + 2^96 - 2^64 + 1 (mod p)，512位乘积可以只用移位和加减折叠约简。
+    """
+
+    P = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF
+    MASK = (1 << 256) - 1
+
+    def __init__(self):
+        super().__init__(self.P)
+
+    def reduce_solinas(self, x: int) -> int:
+        """Solinas快速约简（0 <= x < p^2）
+
+        高256位 h 折叠为 h*2^224 + h*2^96 - h*2^64 + h，每次折叠缩短约32位，
+        最后至多减一次p。
+        """
+        mask = self.MASK
+        while x >> 256:
+            h = x >> 256
+            x = (x & mask) + (h << 224) + (h << 96) - (h << 64) + h
+        if x >= self.P:
+            x -= self.P
+        return x
+
+    def mul_solinas(self, a: int, b: int) -> int:
+        """模乘（Solinas约简）"""
+        return self.reduce_solinas(a * b)
+
+    def sqr_solinas(self, a: int) -> int:
+        """模平方（Solinas约简）"""
+        return self.reduce_solinas(a * a)
+
+
+class BarrettReducer:
+    """Barrett约简，适用于任意模数（如SM2群的阶n）
+
+    预计算 mu = floor(4^k / m)，约简时用乘法和移位估计商，最多再减两次m。
+    """
+
+    def __init__(self, m: int):
+        self.m = m
+        self.k = m.bit_length()
+        self.mu = (1 << (2 * self.k)) // m
+
+    def reduce(self, x: int) -> int:
+        """约简 0 <= x < m^2"""
+        q = ((x >> (self.k - 1)) * self.mu) >> (self.k + 1)
+        r = x - q * self.m
+        while r >= self.m:
+            r -= self.m
+        return r
+
+    def mul(self, a: int, b: int) -> int:
+        return self.reduce(a * b)
+
+
+class MontgomeryReducer:
+    """Montgomery约简，R = 2^k > m，元素以 aR mod m 的形式参与运算"""
+
+    def __init__(self, m: int):
+        self.m = m
+        self.k = m.bit_length()
+        self.r_mask = (1 << self.k) - 1
+        self.r2 = (1 << (2 * self.k)) % m
+        # m' = -m^-1 mod R
+        self.m_prime = (-pow(m, -1, 1 << self.k)) & self.r_mask
+
+    def redc(self, t: int) -> int:
+        """REDC: 返回 t * R^-1 mod m（0 <= t < mR）"""
+        u = ((t & self.r_mask) * self.m_prime) & self.r_mask
+        t = (t + u * self.m) >> self.k
+        return t - self.m if t >= self.m else t
+
+    def to_montgomery(self, a: int) -> int:
+        return self.redc(a * self.r2)
+
+    def from_montgomery(self, a: int) -> int:
+        return self.redc(a)
+
+    def mul(self, a: int, b: int) -> int:
+        """Montgomery域中的乘法: aR * bR -> abR"""
+        return self.redc(a * b)
+
+
+def benchmark_field(iterations: int = 100000) -> dict:
+    """域运算微基准测试：比较内置 % 与各专用约简方法（单位：纳秒/次）"""
+    n = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFF7203DF6B21C6052B53BBF40939D54123
+    field = SM2PrimeField()
+    barrett = BarrettReducer(n)
+    montgomery = MontgomeryReducer(n)
+    p = field.p
+
+    a, b = random.randrange(p), random.randrange(p)
+    an, bn = random.randrange(n), random.randrange(n)
+    am, bm = montgomery.to_montgomery(an), montgomery.to_montgomery(bn)
+
+    # 正确性检查
+    assert field.mul_solinas(a, b) == a * b % p
+    assert barrett.mul(an, bn) == an * bn % n
+    assert montgomery.from_montgomery(montgomery.mul(am, bm)) == an * bn % n
+
+    def timed(func, count: int) -> float:
+        start = time.perf_counter_ns()
+        for _ in range(count):
+            func()
+        return (time.perf_counter_ns() - start) / count
+
+    # 求逆比乘法慢两个数量级，减少迭代次数
+    inv_iterations = max(1, iterations // 100)
+    return {
+        "p_mul_builtin": timed(lambda: a * b % p, iterations),
+        "p_mul_solinas": timed(lambda: field.mul_solinas(a, b), iterations),
+        "n_mul_builtin": timed(lambda: an * bn % n, iterations),
+        "n_mul_barrett": timed(lambda: barrett.mul(an, bn), iterations),
+        "n_mul_montgomery": timed(lambda: montgomery.mul(am, bm), iterations),
+        "p_inv_fermat": timed(lambda: pow(a, p - 2, p), inv_iterations),
+        "p_inv_builtin": timed(lambda: field.inv(a), inv_iterations),
+    }
+
+
+if __name__ == "__main__":
+    print("SM2域运算微基准测试（纳秒/次）")
+    for name, value in benchmark_field().items():
+        print(f"{name:<20} {value:>10.1f}")
@@ -1,7 +1,8 @@
-import hashlib
 import random
 from typing import Tuple, Optional
 
+from sm3_backend import sm3_hash
+
 class SM2:
     """SM2椭圆曲线数字签名算法的Python实现"""
     
@@ -17,9 +18,8 @@ class SM2:
         self.G = (self.GX, self.GY)
     
     def sm3_hash(self, data: bytes) -> bytes:
-        """SM3哈希算法的简化实现（这里使用SHA256作为替代）"""
-        # 实际应该使用SM3，这里用SHA256替代演示
-        return hashlib.sha256(data).digest()
+        """SM3哈希算法（后端见 sm3_backend）"""
+        return sm3_hash(data)
     
     def mod_inverse(self, a: int, m: int) -> int:
         """模逆运算"""
@@ -0,0 +1,158 @@
+import functools
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+EVICTION_POLICIES = ("lru", "fifo")
+
+# 区分“未命中”与缓存值为None
+_MISSING = object()
+
+
+class LRUCache:
+    """容量有界的缓存，带命中/未命中/淘汰统计
+
+    policy 为 "lru" 时命中的项移到队尾（最近使用），"fifo" 时按插入顺序淘汰；
+    capacity <= 0 表示不缓存任何项。
+    """
+
+    def __init__(self, capacity: int = 4096, policy: str = "lru"):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"未知的淘汰策略: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Optional[object] = None) -> Optional[object]:
+        """查找缓存项，未命中时返回 default"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            if self.policy == "lru":
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, entry: object) -> None:
+        """插入缓存项，超出容量时按淘汰策略移除最旧的项"""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def resize(self, capacity: int) -> None:
+        """调整容量，多出的项立即淘汰"""
+        with self._lock:
+            self.capacity = capacity
+            self._evict()
+
+    def _evict(self) -> None:
+        while len(self._entries) > max(self.capacity, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存（统计计数保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class MemoCache(LRUCache):
+    """函数级记忆化缓存，可按函数单独开关"""
+
+    def __init__(self, name: str, capacity: int = 1024, policy: str = "lru", enabled: bool = True):
+        super().__init__(capacity, policy)
+        self.name = name
+        self.enabled = enabled
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["enabled"] = self.enabled
+        return stats
+
+
+# 已注册的记忆化缓存 {名称: 缓存}
+_registry: Dict[str, MemoCache] = {}
+
+
+def memoize(name: str, capacity: int = 1024, policy: str = "lru",
+            enabled: bool = True) -> Callable[[Callable], Callable]:
+    """按位置参数记忆化函数结果，缓存以 name 注册，可通过 configure_cache 调整
+
+    关闭时直接调用原函数，不查找也不写入缓存。同名缓存重复注册（如模块重新加载）时替换旧缓存。
+    """
+    cache = MemoCache(name, capacity, policy, enabled)
+    _registry[name] = cache
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args):
+            if not cache.enabled:
+                return func(*args)
+            result = cache.get(args, _MISSING)
+            if result is _MISSING:
+                result = func(*args)
+                cache.put(args, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def get_cache(name: str) -> MemoCache:
+    cache = _registry.get(name)
+    if cache is None:
+        raise ValueError(f"未知的缓存: {name}")
+    return cache
+
+
+def configure_cache(name: str, capacity: Optional[int] = None, enabled: Optional[bool] = None,
+                    policy: Optional[str] = None) -> MemoCache:
+    """调整已注册缓存的容量、开关与淘汰策略；关闭时同时清空已缓存的项"""
+    cache = get_cache(name)
+    if policy is not None:
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"未知的淘汰策略: {policy}")
+        cache.policy = policy
+    if capacity is not None:
+        cache.resize(capacity)
+    if enabled is not None:
+        cache.enabled = enabled
+        if not enabled:
+            cache.clear()
+    return cache
+
+
+def cache_stats() -> Dict[str, dict]:
+    """所有已注册缓存的统计信息"""
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+def clear_caches() -> None:
+    for cache in _registry.values():
+        cache.clear()
@@ -0,0 +1,332 @@
+import functools
+import threading
+import types
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sm2_implementation import SM2
+from sm2_optimized import OptimizedSM2
+
+# 计数项
+POINT_DOUBLE = "point_double"
+POINT_ADD = "point_add"
+POINT_ADD_MIXED = "point_add_mixed"
+POINT_ADD_CO_Z = "point_add_co_z"
+FIELD_MUL = "field_mul"
+FIELD_SQR = "field_sqr"
+FIELD_INV = "field_inv"
+SCALAR_INV = "scalar_inv"
+
+# 代价函数: (所属类或模块, *调用参数) -> {计数项: 次数}
+CostFunction = Callable[..., Dict[str, int]]
+
+
+def _affine_add_cost(P1, P2, infinity) -> Dict[str, int]:
+    """仿射点加/点倍的域乘法次数（模逆由被调用的求逆函数单独计数）"""
+    if P1 == infinity or P2 == infinity:
+        return {}
+    if P1[0] == P2[0]:
+        if P1[1] != P2[1]:
+            return {}
+        return {POINT_DOUBLE: 1, FIELD_MUL: 2, FIELD_SQR: 2}
+    return {POINT_ADD: 1, FIELD_MUL: 2, FIELD_SQR: 1}
+
+
+def _inverse_cost(field_modulus: int, modulus: int) -> Dict[str, int]:
+    return {FIELD_INV: 1} if modulus == field_modulus else {SCALAR_INV: 1}
+
+
+def _jacobian_double_cost(cls, self, P) -> Dict[str, int]:
+    if P is None or P[1] == 0:
+        return {}
+    if not self._a_is_minus_3:
+        return {POINT_DOUBLE: 1, FIELD_MUL: 3, FIELD_SQR: 6}
+    return {POINT_DOUBLE: 1, FIELD_MUL: 3, FIELD_SQR: 5}
+
+
+def _jacobian_add_cost(cls, self, P1, P2) -> Dict[str, int]:
+    if P1 is None or P2 is None:
+        return {}
+    return {POINT_ADD: 1, FIELD_MUL: 12, FIELD_SQR: 4}
+
+
+def _jacobian_add_mixed_cost(cls, self, P1, P2) -> Dict[str, int]:
+    if P1 is None or P2 is None:
+        return {}
+    return {POINT_ADD_MIXED: 1, FIELD_MUL: 8, FIELD_SQR: 3}
+
+
+def _jacobian_to_affine_cost(cls, self, P) -> Dict[str, int]:
+    if P is None or P[2] == 1:
+        return {}
+    return {FIELD_MUL: 3, FIELD_SQR: 1}
+
+
+def _co_z_ladder_cost(cls, self, k, P) -> Dict[str, int]:
+    """每一位一次ZADDC(6M+3S)与一次ZADDU(5M+2S)，初始缩放3M+1S；初始点倍由 _jacobian_double 计数"""
+    if P is None or k % self.N == 0:
+        return {}
+    bits = self.N.bit_length()
+    return {POINT_ADD_CO_Z: 2 * bits, FIELD_MUL: 11 * bits + 3, FIELD_SQR: 5 * bits + 1}
+
+
+def _batch_to_affine_cost(cls, self, points) -> Dict[str, int]:
+    n = sum(1 for point in points if point is not None)
+    return {FIELD_MUL: 6 * n, FIELD_SQR: n}
+
+
+class InstrumentationSpec:
+    """一个类或模块的插桩说明
+
+    primitives: 被计数的底层运算及其代价函数（按公式静态计算域乘法/平方次数）；
+    operations: 高层操作，底层计数按最外层正在执行的操作归类。
+    """
+
+    def __init__(self, primitives: Dict[str, CostFunction], operations: Tuple[str, ...]):
+        self.primitives = primitives
+        self.operations = operations
+
+
+OPTIMIZED_SPEC = InstrumentationSpec(
+    primitives={
+        "mod_inverse_fast": lambda cls, self, a, m: _inverse_cost(self.P, m),
+        "point_add_basic": lambda cls, self, P1, P2: _affine_add_cost(P1, P2, None),
+        "point_double_optimized": lambda cls, self, P: (
+            {} if P is None else {POINT_DOUBLE: 1, FIELD_MUL: 2, FIELD_SQR: 3}),
+        "_jacobian_double": _jacobian_double_cost,
+        "_jacobian_add": _jacobian_add_cost,
+        "_jacobian_add_mixed": _jacobian_add_mixed_cost,
+        "_jacobian_to_affine": _jacobian_to_affine_cost,
+        "_co_z_ladder_jacobian": _co_z_ladder_cost,
+        "_batch_to_affine": _batch_to_affine_cost,
+    },
+    operations=(
+        "generate_keypair_secure", "generate_keypairs", "sign_optimized", "sign_many", "sign_digest",
+        "sign_stream", "verify_optimized", "verify_digest", "verify_stream", "verify_batch",
+        "point_multiply_windowed", "point_multiply_precomputed", "montgomery_ladder",
+        "simultaneous_multiply", "multi_scalar_multiply",
+    ))
+
+BASIC_SPEC = InstrumentationSpec(
+    primitives={
+        "mod_inverse": lambda cls, self, a, m: _inverse_cost(self.P, m),
+        "point_add": lambda cls, self, P1, P2: _affine_add_cost(P1, P2, None),
+    },
+    operations=("generate_keypair", "sign", "verify", "point_multiply"))
+
+# zbc.py / sm2_poc.py 的模块级函数（无穷远点表示为 (0, 0)）；
+# 模块内的标量乘法走 CURVE_ENGINE（OptimizedSM2），插桩模块时一并插桩该引擎的类，见 _expand_targets
+AFFINE_MODULE_SPEC = InstrumentationSpec(
+    primitives={
+        "modular_inverse": lambda module, value, modulus: _inverse_cost(module.PRIME_MODULUS, modulus),
+        "sm2_point_addition": lambda module, pt1, pt2: _affine_add_cost(pt1, pt2, (0, 0)),
+    },
+    operations=(
+        "generate_keypair", "sm2_scalar_multiplication", "sign_with_sm2", "verify_sm2_signature",
+        "sign_message_with_k", "ecdsa_sign_for_poc", "ecdsa_verify_for_poc",
+    ))
+
+
+def _spec_for(target) -> InstrumentationSpec:
+    if isinstance(target, type):
+        if issubclass(target, OptimizedSM2):
+            return OPTIMIZED_SPEC
+        if issubclass(target, SM2):
+            return BASIC_SPEC
+    elif isinstance(target, types.ModuleType) and hasattr(target, "sm2_point_addition"):
+        return AFFINE_MODULE_SPEC
+    raise ValueError(f"不支持插桩的对象: {target!r}")
+
+
+def _expand_targets(targets) -> list:
+    """模块带有 CURVE_ENGINE 时追加引擎的类，使模块内的点运算也被计数（同一对象只插桩一次）"""
+    expanded = []
+    for target in targets:
+        extra = [target]
+        engine = getattr(target, "CURVE_ENGINE", None) if isinstance(target, types.ModuleType) else None
+        if isinstance(engine, OptimizedSM2):
+            extra.append(type(engine))
+        for item in extra:
+            if all(item is not seen for seen in expanded):
+                expanded.append(item)
+    return expanded
+
+
+class OpCounter:
+    """运算计数结果
+
+    totals: 全部底层运算计数；operations: 按最外层高层操作归类的累计计数；
+    calls: 各高层操作的调用次数。
+    """
+
+    def __init__(self):
+        self.totals: Counter = Counter()
+        self.operations: Dict[str, Counter] = {}
+        self.calls: Counter = Counter()
+        self._current: Optional[str] = None
+        self._depth = 0
+
+    def _enter(self, name: str) -> None:
+        if self._depth == 0:
+            self._current = name
+            self.calls[name] += 1
+        self._depth += 1
+
+    def _exit(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._current = None
+
+    def _record(self, counts: Dict[str, int]) -> None:
+        self.totals.update(counts)
+        if self._current is not None:
+            self.operations.setdefault(self._current, Counter()).update(counts)
+
+    def reset(self) -> None:
+        self.totals.clear()
+        self.operations.clear()
+        self.calls.clear()
+
+    def per_call(self, name: str) -> Dict[str, float]:
+        """某个高层操作平均每次调用的运算计数"""
+        calls = self.calls.get(name, 0)
+        if not calls:
+            return {}
+        return {key: value / calls for key, value in self.operations.get(name, Counter()).items()}
+
+    def stats(self) -> dict:
+        return {
+            "totals": dict(self.totals),
+            "calls": dict(self.calls),
+            "per_call": {name: self.per_call(name) for name in self.calls},
+        }
+
+    def report(self) -> str:
+        """按操作列出平均每次调用的运算计数"""
+        keys = (POINT_DOUBLE, POINT_ADD, POINT_ADD_MIXED, POINT_ADD_CO_Z,
+                FIELD_MUL, FIELD_SQR, FIELD_INV, SCALAR_INV)
+        lines = [f"{'operation':<44} {'calls':>6} " + " ".join(f"{key:>15}" for key in keys)]
+        for name in sorted(self.calls):
+            avg = self.per_call(name)
+            lines.append(f"{name:<44} {self.calls[name]:>6} " +
+                         " ".join(f"{avg.get(key, 0):>15.1f}" for key in keys))
+        return "\n".join(lines)
+
+
+# 当前启用的计数器与已插桩对象 {id(target): (target, 原属性列表, 引用计数)}
+_active_counters: List[OpCounter] = []
+_installed: Dict[int, list] = {}
+_install_lock = threading.Lock()
+
+
+def _qualified_name(target, name: str) -> str:
+    owner = target.__name__.rsplit(".", 1)[-1]
+    return f"{owner}.{name}"
+
+
+def _wrap_primitive(target, func, cost: CostFunction):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        counts = cost(target, *args, **kwargs)
+        for counter in _active_counters:
+            counter._record(counts)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def _wrap_operation(name: str, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        counters = list(_active_counters)
+        for counter in counters:
+            counter._enter(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            for counter in counters:
+                counter._exit()
+    return wrapper
+
+
+def _install(target) -> None:
+    entry = _installed.get(id(target))
+    if entry is not None:
+        entry[2] += 1
+        return
+
+    spec = _spec_for(target)
+    originals = []
+    patches = [(name, lambda func, cost=cost: _wrap_primitive(target, func, cost))
+               for name, cost in spec.primitives.items()]
+    patches += [(name, lambda func, name=name: _wrap_operation(_qualified_name(target, name), func))
+                for name in spec.operations]
+    for name, make_wrapper in patches:
+        if not hasattr(target, name):
+            continue
+        own = name in vars(target)
+        originals.append((name, own, vars(target).get(name)))
+        setattr(target, name, make_wrapper(getattr(target, name)))
+    _installed[id(target)] = [target, originals, 1]
+
+
+def _uninstall(target) -> None:
+    entry = _installed[id(target)]
+    entry[2] -= 1
+    if entry[2]:
+        return
+    for name, own, original in reversed(entry[1]):
+        if own:
+            setattr(target, name, original)
+        else:
+            delattr(target, name)
+    del _installed[id(target)]
+
+
+@contextmanager
+def count_operations(*targets) -> Iterator[OpCounter]:
+    """在上下文内统计点倍、点加、域乘法/平方与求逆次数
+
+    targets 为 OptimizedSM2、SM2（或其子类）以及 zbc / sm2_poc 模块对象，默认插桩两个类；
+    模块的点乘委托给其 CURVE_ENGINE，传入模块时同时插桩该引擎的类，
+    点倍/点加按Jacobian公式计数并归入最外层的模块函数（如 zbc.sign_with_sm2）。
+    只在上下文内替换相关方法/函数，退出后恢复原实现，未启用时没有任何额外开销。
+    计数基于调用次数与各公式的静态代价，与运行机器无关；
+    插桩对进程内所有线程生效，已通过 from ... import 绑定的函数引用不会被替换。
+    """
+    targets = _expand_targets(targets or (OptimizedSM2, SM2))
+    counter = OpCounter()
+    with _install_lock:
+        installed = []
+        try:
+            for target in targets:
+                _install(target)
+                installed.append(target)
+        except Exception:
+            for target in reversed(installed):
+                _uninstall(target)
+            raise
+        _active_counters.append(counter)
+    try:
+        yield counter
+    finally:
+        with _install_lock:
+            _active_counters.remove(counter)
+            for target in reversed(installed):
+                _uninstall(target)
+
+
+if __name__ == "__main__":
+    sm2 = OptimizedSM2()
+    basic = SM2()
+    private_key, public_key = sm2.generate_keypair_secure()
+    k = private_key ^ 0x5A5A
+
+    with count_operations() as ops:
+        signature = sm2.sign_optimized(b"message", private_key)
+        sm2.verify_optimized(b"message", signature, public_key)
+        sm2.point_multiply_windowed(k, public_key)
+        sm2.montgomery_ladder(k, public_key)
+        sm2.simultaneous_multiply(k, sm2.G, private_key, public_key)
+        basic.point_multiply(k, public_key)
+    print(ops.report())
@@ -1,39 +1,254 @@
 import hashlib
+import mmap
+import os
+import queue
 import random
+import stat
+import struct
+import tempfile
+import threading
 import time
-from typing import Tuple, Optional, List
+from typing import Tuple, Optional, List, Dict, NamedTuple, Union, Iterable, BinaryIO
+
+from sm2_curve import CurveParams, SM2_RECOMMENDED
+from sm2_field import PrimeField, SM2PrimeField
+from sm2_memo import LRUCache
+from sm2_za import ZACalculator, ZARegistry
+from sm3_backend import sm3_hash, sm3_hash_batch, new as sm3_new
+
+# 流式签名的输入：文件路径、文件对象或字节块迭代器
+StreamSource = Union[str, os.PathLike, BinaryIO, Iterable[bytes]]
+STREAM_CHUNK_SIZE = 1 << 20
+
+
+def update_from_stream(hasher, source: StreamSource, chunk_size: int = STREAM_CHUNK_SIZE) -> None:
+    """将数据源按块送入哈希对象，不在内存中拼接完整消息
+
+    文件路径只在指向非空普通文件时使用mmap；FIFO、/proc 文件、/dev/stdin 等报告的大小为0，
+    与文件对象一样按块读入。
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+                _update_from_file(hasher, f, chunk_size)
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for i in range(0, len(view), chunk_size):
+                        hasher.update(view[i:i + chunk_size])
+                finally:
+                    view.release()
+    elif hasattr(source, 'readinto'):
+        _update_from_file(hasher, source, chunk_size)
+    elif hasattr(source, 'read'):
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            hasher.update(chunk)
+    else:
+        for chunk in source:
+            hasher.update(memoryview(chunk))
+
+
+def _update_from_file(hasher, f: BinaryIO, chunk_size: int) -> None:
+    """按块读入复用的缓冲区并送入哈希对象"""
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        n = f.readinto(buffer)
+        if not n:
+            break
+        hasher.update(view[:n])
+
+
+class PublicKeyEntry(NamedTuple):
+    """单个 (公钥, 用户ID) 的验证预计算结果"""
+    za: bytes                               # ZA摘要
+    valid: bool                             # 公钥是否为曲线上的合法点
+    wnaf_table: List[Tuple[int, int]]       # 奇数倍点表 [P, 3P, 5P, ...]（仿射坐标）
+
+
+class PublicKeyCache(LRUCache):
+    """公钥相关数据的LRU缓存，用于热点公钥的重复验签与解压"""
+
 
 class OptimizedSM2:
-    """SM2椭圆曲线密码算法的优化实现"""
+    """SM2椭圆曲线密码算法的优化实现（曲线参数由 curve 指定，默认为SM2推荐曲线）"""
+    
+    # SM2推荐参数（实例按 curve 覆盖）
+    P = SM2_RECOMMENDED.p
+    A = SM2_RECOMMENDED.a
+    B = SM2_RECOMMENDED.b
+    GX = SM2_RECOMMENDED.gx
+    GY = SM2_RECOMMENDED.gy
+    N = SM2_RECOMMENDED.n
+    
+    # 预计算表文件格式: 魔数 | 版本 | 窗口大小 | 窗口数 | 曲线指纹 | 数据摘要 | 点坐标(x||y, 各32字节)
+    TABLE_MAGIC = b"SM2PTBL\x00"
+    TABLE_VERSION = 1
+    TABLE_HEADER = struct.Struct(">8sHBH32s32s")
+    
+    # 公钥wNAF窗口宽度（每个公钥缓存 2^(w-2) 个奇数倍点）
+    PUBKEY_WNAF_WIDTH = 5
     
-    # SM2推荐参数
-    P = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF
-    A = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFC
-    B = 0x28E9FA9E9D9F5E344D5A9E4BCF6509A7F39789F515AB8F92DDBCBD414D940E93
-    GX = 0x32C4AE2C1F1981195F9904466A39C9948FE30BBFF2660BE1715A4589334C74C7
-    GY = 0xBC3736A2F4F6779C59BDCEE36B692153D0A9877CC62A474002DF32E52139F0A0
-    N = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFF7203DF6B21C6052B53BBF40939D54123
+    # 基点wNAF窗口宽度（交错wNAF验签使用 2^(w-2) 个基点奇数倍点）
+    G_WNAF_WIDTH = 8
+    _generator_wnaf_tables: Dict[Tuple[CurveParams, int], List[Tuple[int, int]]] = {}
     
-    def __init__(self):
+    # 进程级基点预计算表缓存 {(curve, window_size): table}，同一曲线的所有实例共享
+    _generator_tables: Dict[Tuple[CurveParams, int], List[List[Tuple[int, int]]]] = {}
+    _generator_tables_lock = threading.Lock()
+    
+    # 秘密标量点乘方法
+    SECRET_SCALAR_METHODS = ("ladder", "comb")
+    
+    # 坐标编码长度（字节）
+    COORD_SIZE = 32
+    
+    def __init__(self, window_size: int = 4, table_path: Optional[str] = None,
+                 pubkey_cache_size: int = 4096, point_cache_size: int = 4096,
+                 secret_scalar_method: str = "ladder", curve: CurveParams = SM2_RECOMMENDED,
+                 za_registry: Optional[ZARegistry] = None):
+        if secret_scalar_method not in self.SECRET_SCALAR_METHODS:
+            raise ValueError(f"未知的秘密标量点乘方法: {secret_scalar_method}")
+        self.curve = curve
+        self.P, self.A, self.B = curve.p, curve.a, curve.b
+        self.GX, self.GY, self.N = curve.gx, curve.gy, curve.n
+        self.COORD_SIZE = curve.coord_size
         self.G = (self.GX, self.GY)
-        # 预计算表用于加速点乘运算
-        self.precomputed_points = self._precompute_points()
+        # SM2推荐曲线使用专用素域（Solinas约简），其他曲线使用通用素域
+        self.field = SM2PrimeField() if curve.p == SM2PrimeField.P else PrimeField(curve.p)
+        # a = -3 时点倍运算可使用更快的公式
+        self._a_is_minus_3 = (curve.a + 3) % curve.p == 0
+        self.window_size = window_size
+        # 固定基点预计算表用于加速基点点乘运算（每个进程只计算一次）
+        self.precomputed_points = self._get_generator_table(window_size, table_path)
+        # 公钥预计算缓存（ZA、合法性校验结果、wNAF表）
+        self.pubkey_cache = PublicKeyCache(pubkey_cache_size)
+        # 私钥与签名随机数的基点乘法: "ladder"（co-Z蒙哥马利阶梯，操作序列固定）
+        # 或 "comb"（固定基点预计算表，更快但查表位置依赖于标量）
+        self.secret_scalar_method = secret_scalar_method
+        # 压缩公钥解压缓存 {压缩编码: 点}，避免热点公钥重复开平方
+        self.point_cache = PublicKeyCache(point_cache_size)
+        # ZA计算：缓存曲线参数前缀的SM3状态，可选 (user_id, 公钥) -> ZA 注册表
+        self.za_calculator = ZACalculator(curve, za_registry)
+    
+    def _get_generator_table(self, window_size: int, 
+                             table_path: Optional[str] = None) -> List[List[Tuple[int, int]]]:
+        """获取基点预计算表：进程内缓存 -> 磁盘文件 -> 重新计算"""
+        cls = type(self)
+        key = (self.curve, window_size)
+        table = cls._generator_tables.get(key)
+        if table is not None and (table_path is None or os.path.exists(table_path)):
+            return table
         
-    def _precompute_points(self, window_size: int = 4) -> List[Tuple[int, int]]:
-        """预计算基点的倍数，用于滑动窗口法"""
-        precomputed = [None] * (1 << window_size)  # 2^window_size 个点
-        precomputed[0] = None  # 0*G = O (无穷远点)
-        precomputed[1] = self.G  # 1*G = G
+        with cls._generator_tables_lock:
+            table = cls._generator_tables.get(key)
+            if table is None:
+                if table_path is not None and os.path.exists(table_path):
+                    try:
+                        table = self.load_precomputed_table(table_path, window_size)
+                    except ValueError:
+                        table = None  # 文件损坏或版本不符，重新计算并覆盖
+                
+                if table is None:
+                    table = self._precompute_points(window_size)
+                    if table_path is not None:
+                        self.save_precomputed_table(table_path, table, window_size)
+                
+                cls._generator_tables[key] = table
+            
+            # 表来自进程内缓存时文件可能还不存在（本进程此前创建过未指定 table_path 的实例）
+            if table_path is not None and not os.path.exists(table_path):
+                self.save_precomputed_table(table_path, table, window_size)
+        return table
+    
+    def _curve_fingerprint(self) -> bytes:
+        """曲线参数指纹，防止加载其他曲线的预计算表"""
+        return self.curve.fingerprint()
+    
+    def save_precomputed_table(self, path: str, table: Optional[List[List[Tuple[int, int]]]] = None,
+                               window_size: Optional[int] = None) -> None:
+        """将基点预计算表序列化到磁盘（先写临时文件再原子替换）"""
+        if table is None:
+            table = self.precomputed_points
+            window_size = self.window_size
+        
+        payload = b"".join(x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+                           for row in table for x, y in row)
+        header = self.TABLE_HEADER.pack(self.TABLE_MAGIC, self.TABLE_VERSION, window_size, len(table),
+                                        self._curve_fingerprint(), hashlib.sha256(payload).digest())
+        
+        # 临时文件名唯一，并发写同一路径时各自替换，不会互相删除对方的临时文件
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                        dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def load_precomputed_table(self, path: str, window_size: int) -> List[List[Tuple[int, int]]]:
+        """通过内存映射加载基点预计算表，并校验版本、曲线参数与数据完整性"""
+        header_size = self.TABLE_HEADER.size
+        row_size = (1 << window_size) - 1
         
-        for i in range(2, 1 << window_size):
-            precomputed[i] = self.point_add_basic(precomputed[i-1], self.G)
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < header_size:
+                raise ValueError("预计算表文件不完整")
+            magic, version, file_window, windows, fingerprint, digest = self.TABLE_HEADER.unpack_from(mm)
+            if magic != self.TABLE_MAGIC or version != self.TABLE_VERSION:
+                raise ValueError("预计算表文件格式或版本不匹配")
+            if file_window != window_size or fingerprint != self._curve_fingerprint():
+                raise ValueError("预计算表与当前曲线参数或窗口大小不匹配")
+            if windows != (self.N.bit_length() + window_size - 1) // window_size:
+                raise ValueError("预计算表窗口数与曲线阶不匹配")
             
-        return precomputed
+            payload = memoryview(mm)[header_size:]
+            try:
+                if len(payload) != windows * row_size * 64 or hashlib.sha256(payload).digest() != digest:
+                    raise ValueError("预计算表数据校验失败")
+                
+                coords = [int.from_bytes(payload[i:i + 32], 'big') for i in range(0, len(payload), 32)]
+            finally:
+                payload.release()
+        
+        points = list(zip(coords[0::2], coords[1::2]))
+        return [points[i * row_size:(i + 1) * row_size] for i in range(windows)]
+        
+    def _precompute_points(self, window_size: int = 4) -> List[List[Tuple[int, int]]]:
+        """预计算固定基点表（多窗口）
+        
+        第i行保存 j * 2^(w*i) * G (j = 1, ..., 2^w - 1)，共 ceil(256/w) 行。
+        计算 k*G 时每个窗口直接查表做一次点加，不需要任何点倍运算。
+        """
+        row_size = (1 << window_size) - 1
+        windows = (self.N.bit_length() + window_size - 1) // window_size
+        
+        jacobian_points = []
+        base = self._to_jacobian(self.G)  # 2^(w*i) * G
+        for _ in range(windows):
+            row_point = base
+            jacobian_points.append(row_point)
+            for _ in range(row_size - 1):
+                row_point = self._jacobian_add(row_point, base)
+                jacobian_points.append(row_point)
+            for _ in range(window_size):
+                base = self._jacobian_double(base)
+        
+        # 统一转换为仿射坐标，查表后可使用混合加法
+        affine_points = self._batch_to_affine(jacobian_points)
+        return [affine_points[i * row_size:(i + 1) * row_size] for i in range(windows)]
     
     def mod_inverse_fast(self, a: int, m: int) -> int:
-        """优化的模逆运算（使用费马小定理）"""
-        # 对于素数模，使用费马小定理: a^(p-2) ≡ a^(-1) (mod p)
-        return pow(a, m - 2, m)
+        """优化的模逆运算"""
+        # pow(a, -1, m) 为CPython内置的扩展欧几里得算法，比费马小定理 a^(p-2) 快约7倍
+        # （见 sm2_field.benchmark_field）
+        return pow(a, -1, m)
     
     def point_add_basic(self, P1: Optional[Tuple[int, int]], P2: Optional[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
         """基础椭圆曲线点加运算"""
@@ -76,6 +291,116 @@ class OptimizedSM2:
         
         return (x3, y3)
     
+    def _to_jacobian(self, P: Optional[Tuple[int, int]]) -> Optional[Tuple[int, int, int]]:
+        """仿射坐标转换为Jacobian坐标 (x, y) -> (X, Y, 1)"""
+        if P is None:
+            return None
+        return (P[0], P[1], 1)
+    
+    def _jacobian_to_affine(self, P: Optional[Tuple[int, int, int]]) -> Optional[Tuple[int, int]]:
+        """Jacobian坐标转换为仿射坐标，只需一次模逆: x = X/Z^2, y = Y/Z^3"""
+        if P is None:
+            return None
+        X, Y, Z = P
+        if Z == 1:
+            return (X, Y)
+        z_inv = self.mod_inverse_fast(Z, self.P)
+        z_inv2 = z_inv * z_inv % self.P
+        return (X * z_inv2 % self.P, Y * z_inv2 * z_inv % self.P)
+    
+    def _jacobian_double(self, P: Optional[Tuple[int, int, int]]) -> Optional[Tuple[int, int, int]]:
+        """Jacobian坐标点倍运算（无模逆；a = -3 的曲线如SM2推荐曲线使用特殊形式）"""
+        if P is None:
+            return None
+        X, Y, Z = P
+        if Y == 0:
+            return None
+        p = self.P
+        
+        delta = Z * Z % p
+        gamma = Y * Y % p
+        beta = X * gamma % p
+        if self._a_is_minus_3:
+            # a = -3 时: 3X^2 + aZ^4 = 3(X - Z^2)(X + Z^2)
+            alpha = 3 * (X - delta) * (X + delta) % p
+        else:
+            alpha = (3 * X * X + self.A * delta * delta) % p
+        
+        X3 = (alpha * alpha - 8 * beta) % p
+        Z3 = ((Y + Z) * (Y + Z) - gamma - delta) % p
+        Y3 = (alpha * (4 * beta - X3) - 8 * gamma * gamma) % p
+        
+        return (X3, Y3, Z3)
+    
+    def _jacobian_add(self, P1: Optional[Tuple[int, int, int]], 
+                      P2: Optional[Tuple[int, int, int]]) -> Optional[Tuple[int, int, int]]:
+        """Jacobian坐标点加运算（无模逆）"""
+        if P1 is None:
+            return P2
+        if P2 is None:
+            return P1
+        
+        X1, Y1, Z1 = P1
+        X2, Y2, Z2 = P2
+        p = self.P
+        
+        z1z1 = Z1 * Z1 % p
+        z2z2 = Z2 * Z2 % p
+        u1 = X1 * z2z2 % p
+        u2 = X2 * z1z1 % p
+        s1 = Y1 * Z2 * z2z2 % p
+        s2 = Y2 * Z1 * z1z1 % p
+        
+        h = (u2 - u1) % p
+        r = (s2 - s1) % p
+        if h == 0:
+            if r == 0:
+                return self._jacobian_double(P1)
+            return None  # 相反点
+        
+        hh = h * h % p
+        hhh = h * hh % p
+        v = u1 * hh % p
+        
+        X3 = (r * r - hhh - 2 * v) % p
+        Y3 = (r * (v - X3) - s1 * hhh) % p
+        Z3 = Z1 * Z2 * h % p
+        
+        return (X3, Y3, Z3)
+    
+    def _jacobian_add_mixed(self, P1: Optional[Tuple[int, int, int]], 
+                            P2: Optional[Tuple[int, int]]) -> Optional[Tuple[int, int, int]]:
+        """Jacobian点与仿射点的混合加法（Z2 = 1，省去若干乘法）"""
+        if P2 is None:
+            return P1
+        if P1 is None:
+            return (P2[0], P2[1], 1)
+        
+        X1, Y1, Z1 = P1
+        x2, y2 = P2
+        p = self.P
+        
+        z1z1 = Z1 * Z1 % p
+        u2 = x2 * z1z1 % p
+        s2 = y2 * Z1 * z1z1 % p
+        
+        h = (u2 - X1) % p
+        r = (s2 - Y1) % p
+        if h == 0:
+            if r == 0:
+                return self._jacobian_double(P1)
+            return None  # 相反点
+        
+        hh = h * h % p
+        hhh = h * hh % p
+        v = X1 * hh % p
+        
+        X3 = (r * r - hhh - 2 * v) % p
+        Y3 = (r * (v - X3) - Y1 * hhh) % p
+        Z3 = Z1 * h % p
+        
+        return (X3, Y3, Z3)
+    
     def point_multiply_windowed(self, k: int, P: Tuple[int, int], window_size: int = 4) -> Optional[Tuple[int, int]]:
         """滑动窗口法标量乘法"""
         if k == 0:
@@ -85,128 +410,293 @@ class OptimizedSM2:
         
         # 如果是基点G，使用预计算表
         if P == self.G:
-            return self.point_multiply_precomputed(k, window_size)
+            return self.point_multiply_precomputed(k)
+        
+        # 对于其他点，使用滑动窗口法（Jacobian坐标，最后统一转换为仿射坐标）
+        # 预计算奇数倍点 P, 3P, 5P, ..., (2^w - 1)P
+        odd_points = self._compute_odd_multiples(P, window_size)
         
-        # 对于其他点，使用滑动窗口法
         result = None
         bits = bin(k)[2:]  # 去除'0b'前缀
         
         i = 0
         while i < len(bits):
             if bits[i] == '0':
-                result = self.point_add_basic(result, result) if result else None
+                result = self._jacobian_double(result)
                 i += 1
             else:
-                # 找到窗口
+                # 找到窗口（窗口以1结尾，保证窗口值为奇数）
                 window_end = min(i + window_size, len(bits))
+                while bits[window_end - 1] == '0':
+                    window_end -= 1
                 window_val = int(bits[i:window_end], 2)
                 
                 # 左移
                 for _ in range(window_end - i):
-                    result = self.point_add_basic(result, result) if result else None
+                    result = self._jacobian_double(result)
                 
                 # 加上窗口值对应的点
-                window_point = self._compute_window_point(window_val, P)
-                result = self.point_add_basic(result, window_point)
+                result = self._jacobian_add(result, odd_points[window_val >> 1])
                 
                 i = window_end
         
-        return result
+        return self._jacobian_to_affine(result)
     
-    def point_multiply_precomputed(self, k: int, window_size: int = 4) -> Optional[Tuple[int, int]]:
+    def _compute_odd_multiples(self, P: Tuple[int, int], window_size: int) -> List[Tuple[int, int, int]]:
+        """计算奇数倍点表 [P, 3P, 5P, ..., (2^w - 1)P]（Jacobian坐标）"""
+        base = self._to_jacobian(P)
+        double_p = self._jacobian_double(base)
+        
+        odd_points = [base]
+        for _ in range((1 << (window_size - 1)) - 1):
+            odd_points.append(self._jacobian_add(odd_points[-1], double_p))
+        
+        return odd_points
+    
+    def point_multiply_precomputed(self, k: int) -> Optional[Tuple[int, int]]:
         """使用预计算表的基点标量乘法"""
-        if k == 0:
-            return None
+        return self._jacobian_to_affine(self._fixed_base_multiply_jacobian(k))
+    
+    def _fixed_base_multiply_jacobian(self, k: int) -> Optional[Tuple[int, int, int]]:
+        """固定基点乘法 k*G = sum(table[i][k_i]) ，结果为Jacobian坐标
+        
+        k_i 为k的第i个w位窗口，每个非零窗口一次混合加法，无点倍运算。
+        """
+        window_size = self.window_size
+        if k.bit_length() > window_size * len(self.precomputed_points):
+            k %= self.N
         
         result = None
         mask = (1 << window_size) - 1
+        i = 0
         
         while k > 0:
-            if k & mask:
-                window_val = k & mask
-                result = self.point_add_basic(result, self.precomputed_points[window_val])
-            
-            # 左移window_size位
-            for _ in range(window_size):
-                result = self.point_add_basic(result, result) if result else None
-            
+            window_val = k & mask
+            if window_val:
+                result = self._jacobian_add_mixed(result, self.precomputed_points[i][window_val - 1])
             k >>= window_size
+            i += 1
         
         return result
     
-    def _compute_window_point(self, window_val: int, base_point: Tuple[int, int]) -> Optional[Tuple[int, int]]:
-        """计算窗口值对应的点"""
-        if window_val == 0:
-            return None
+    def _batch_to_affine(self, points: List[Optional[Tuple[int, int, int]]]) -> List[Optional[Tuple[int, int]]]:
+        """批量Jacobian转仿射坐标（Montgomery技巧：n个点共用一次模逆）"""
+        p = self.P
         
-        result = None
-        addend = base_point
+        # 前缀积 Z1, Z1*Z2, ..., Z1*...*Zn
+        prefix = []
+        acc = 1
+        for point in points:
+            if point is not None:
+                acc = acc * point[2] % p
+            prefix.append(acc)
         
-        while window_val > 0:
-            if window_val & 1:
-                result = self.point_add_basic(result, addend)
-            addend = self.point_add_basic(addend, addend)
-            window_val >>= 1
+        inv = self.mod_inverse_fast(acc, p)
+        result = [None] * len(points)
+        
+        for i in range(len(points) - 1, -1, -1):
+            point = points[i]
+            if point is None:
+                continue
+            X, Y, Z = point
+            z_inv = inv * (prefix[i - 1] if i > 0 else 1) % p
+            inv = inv * Z % p
+            z_inv2 = z_inv * z_inv % p
+            result[i] = (X * z_inv2 % p, Y * z_inv2 * z_inv % p)
         
         return result
     
     def montgomery_ladder(self, k: int, P: Tuple[int, int]) -> Optional[Tuple[int, int]]:
-        """蒙哥马利阶梯法（抗侧信道攻击）"""
-        if k == 0:
+        """蒙哥马利阶梯法（抗侧信道攻击，co-Z Jacobian坐标）"""
+        return self._jacobian_to_affine(self._co_z_ladder_jacobian(k, P))
+    
+    def _co_z_ladder_jacobian(self, k: int, P: Tuple[int, int]) -> Optional[Tuple[int, int, int]]:
+        """co-Z蒙哥马利阶梯（Rivain 2011），结果为Jacobian坐标
+        
+        R0、R1始终共享同一个Z坐标且 R1 - R0 = P。每一位固定执行一次共轭co-Z加法(ZADDC)
+        和一次co-Z加法(ZADDU)，只按比特位选择操作数顺序，不存在依赖于k的分支或点倍运算。
+        标量先规范化为 k + n 或 k + 2n，使比特长度固定为 n 的位数加一，
+        迭代次数与k的大小无关。
+        """
+        n, p = self.N, self.P
+        k %= n
+        if k == 0 or P is None:
             return None
-        if k == 1:
-            return P
+        k += n
+        if k.bit_length() <= n.bit_length():
+            k += n
         
-        bits = bin(k)[2:]
-        R0, R1 = None, P
+        # 初始状态: R0 = P, R1 = 2P（将P缩放到2P的Z坐标上）
+        x, y = P
+        X2, Y2, Z = self._jacobian_double((x, y, 1))
+        zz = Z * Z % p
+        R = [(x * zz % p, y * zz * Z % p), (X2, Y2)]
         
-        for bit in bits[1:]:  # 跳过最高位1
-            if bit == '0':
-                R1 = self.point_add_basic(R0, R1)
-                R0 = self.point_add_basic(R0, R0) if R0 else None
-            else:
-                R0 = self.point_add_basic(R0, R1)
-                R1 = self.point_add_basic(R1, R1) if R1 else None
+        for i in range(k.bit_length() - 2, -1, -1):
+            b = (k >> i) & 1
+            
+            # ZADDC(R_b, R_{1-b}): R_{1-b} <- R_b + R_{1-b}, R_b <- R_b - R_{1-b}
+            (X1, Y1), (X2, Y2) = R[b], R[1 - b]
+            dx = (X1 - X2) % p
+            c = dx * dx % p
+            w1 = X1 * c % p
+            w2 = X2 * c % p
+            a1 = Y1 * (w1 - w2) % p
+            dy = Y1 - Y2
+            sy = Y1 + Y2
+            X3 = (dy * dy - w1 - w2) % p
+            Y3 = (dy * (w1 - X3) - a1) % p
+            Xc = (sy * sy - w1 - w2) % p
+            Yc = (sy * (w1 - Xc) - a1) % p
+            Z = Z * dx % p
+            R[1 - b], R[b] = (X3, Y3), (Xc, Yc)
+            
+            # ZADDU(R_{1-b}, R_b): R_b <- R_{1-b} + R_b, R_{1-b} <- R_{1-b}（更新到新的Z）
+            (X1, Y1), (X2, Y2) = R[1 - b], R[b]
+            dx = (X1 - X2) % p
+            c = dx * dx % p
+            w1 = X1 * c % p
+            w2 = X2 * c % p
+            a1 = Y1 * (w1 - w2) % p
+            dy = Y1 - Y2
+            X3 = (dy * dy - w1 - w2) % p
+            Y3 = (dy * (w1 - X3) - a1) % p
+            Z = Z * dx % p
+            R[b], R[1 - b] = (X3, Y3), (w1, a1)
         
-        return R0
+        if Z == 0:
+            # 中间出现 R0 = ±R1 的退化情况（概率可忽略），改用wNAF计算
+            return self._interleaved_wnaf_jacobian([self._wnaf_term(k, P)])
+        return (R[0][0], R[0][1], Z)
+    
+    def _secret_base_multiply_jacobian(self, k: int) -> Optional[Tuple[int, int, int]]:
+        """秘密标量的基点乘法（私钥、签名随机数），按 secret_scalar_method 选择算法"""
+        if self.secret_scalar_method == "ladder":
+            return self._co_z_ladder_jacobian(k, self.G)
+        return self._fixed_base_multiply_jacobian(k)
+    
+    def _secret_base_multiply(self, k: int) -> Optional[Tuple[int, int]]:
+        """秘密标量的基点乘法，结果为仿射坐标"""
+        return self._jacobian_to_affine(self._secret_base_multiply_jacobian(k))
     
     def generate_keypair_secure(self) -> Tuple[int, Tuple[int, int]]:
         """安全的密钥对生成"""
-        # 使用系统安全随机数生成器
-        private_key = random.SystemRandom().randint(1, self.N - 1)
+        # 使用系统安全随机数生成器；SM2签名需要 1+d 可逆，私钥取自 [1, n-2]
+        private_key = random.SystemRandom().randint(1, self.N - 2)
         
-        # 使用优化的点乘计算公钥
-        public_key = self.point_multiply_windowed(private_key, self.G)
+        # 私钥为秘密标量，使用规则的点乘计算公钥
+        public_key = self._secret_base_multiply(private_key)
         
         return private_key, public_key
     
+    def generate_keypairs(self, count: int) -> List[Tuple[int, Tuple[int, int]]]:
+        """批量生成密钥对，私钥取自 [1, n-2]（公钥以Jacobian坐标计算后统一转换为仿射坐标）
+        
+        耗时由每个私钥的点乘决定，与逐个调用 generate_keypair_secure 基本相同。
+        """
+        rng = random.SystemRandom()
+        private_keys = [rng.randint(1, self.N - 2) for _ in range(count)]
+        public_keys = self._batch_to_affine([self._secret_base_multiply_jacobian(d) for d in private_keys])
+        return list(zip(private_keys, public_keys))
+    
+    def sign_many(self, messages: List[bytes], private_key: int, 
+                  user_id: bytes = b"1234567812345678") -> List[Tuple[int, int]]:
+        """批量SM2签名：ZA与(1+d)^-1只计算一次，所有随机点kG共用一次模逆"""
+        za = self._compute_za(private_key, user_id)
+        d_inv = self.mod_inverse_fast(1 + private_key, self.N)
+        digests = [int.from_bytes(h, 'big') for h in sm3_hash_batch([za + message for message in messages])]
+        return self._sign_digests(digests, private_key, d_inv)
+    
+    def _generate_nonces(self, count: int) -> List[Tuple[int, int]]:
+        """批量生成 (k, x1)，与 _generate_nonce 相同的规范化，但只做一次模逆"""
+        rng = random.SystemRandom()
+        nonces = [rng.randint(1, self.N - 1) for _ in range(count)]
+        points = self._batch_to_affine([self._secret_base_multiply_jacobian(k) for k in nonces])
+        return [(self.N - k if y1 & 1 else k, x1) for k, (x1, y1) in zip(nonces, points)]
+    
+    def _sign_digests(self, digests: List[int], private_key: int, d_inv: int,
+                      nonce_pool: Optional["NoncePool"] = None) -> List[Tuple[int, int]]:
+        """批量签名多个消息摘要，优先使用随机数池，不足部分批量生成"""
+        nonces = []
+        if nonce_pool is not None:
+            while len(nonces) < len(digests):
+                nonce = nonce_pool.take()
+                if nonce is None:
+                    break
+                nonces.append(nonce)
+        nonces += self._generate_nonces(len(digests) - len(nonces))
+        
+        signatures = []
+        for e, (k, x1) in zip(digests, nonces):
+            r = (e + x1) % self.N
+            s = (d_inv * (k - r * private_key)) % self.N
+            if r == 0 or (r + k) % self.N == 0 or s == 0:
+                # 极小概率情况，换一个随机数单独重签
+                signatures.append(self._sign_digest(e, private_key, d_inv, nonce_pool))
+            else:
+                signatures.append((r, s))
+        return signatures
+    
     def sign_optimized(self, message: bytes, private_key: int, 
-                      user_id: bytes = b"1234567812345678") -> Tuple[int, int]:
+                      user_id: bytes = b"1234567812345678",
+                      nonce_pool: Optional["NoncePool"] = None) -> Tuple[int, int]:
         """优化的SM2数字签名"""
-        # 预计算ZA（可以缓存）
+        self._check_nonce_pool(nonce_pool)
+        # 预计算ZA（多次签名请使用 SigningKey 缓存）
         za = self._compute_za(private_key, user_id)
         
         # 计算消息摘要
         m_hash = self.sm3_hash(za + message)
         e = int.from_bytes(m_hash, 'big')
         
+        # (1+d)^-1 与随机数k无关，只需计算一次
+        d_inv = self.mod_inverse_fast(1 + private_key, self.N)
+        return self._sign_digest(e, private_key, d_inv, nonce_pool)
+    
+    def _check_nonce_pool(self, nonce_pool: Optional["NoncePool"]) -> None:
+        """随机数池中的 (k, x1) 只对其所属曲线有效，换用其他曲线的池会得到无效签名"""
+        if nonce_pool is None or nonce_pool.sm2.curve is self.curve:
+            return
+        if nonce_pool.sm2.curve.fingerprint() != self.curve.fingerprint():
+            raise ValueError("随机数池与签名使用的曲线参数不一致")
+    
+    def _generate_nonce(self) -> Tuple[int, int]:
+        """生成签名随机数k及R = kG的x坐标，返回 (k, x1)
+        
+        规范化 R 使其y坐标为偶数：-kG与kG的x坐标相同，r不变，
+        签名仍是标准SM2签名，同时便于批量验证恢复出完整的R点。
+        """
         while True:
             # 使用安全随机数生成器
             k = random.SystemRandom().randint(1, self.N - 1)
             
-            # 使用优化的点乘
-            point = self.point_multiply_windowed(k, self.G)
+            # 随机数为秘密标量，使用规则的点乘
+            point = self._secret_base_multiply(k)
             if point is None:
                 continue
             
-            x1, _ = point
+            x1, y1 = point
+            if y1 & 1:
+                k = self.N - k
+            return k, x1
+    
+    def _sign_digest(self, e: int, private_key: int, d_inv: int,
+                     nonce_pool: Optional["NoncePool"] = None) -> Tuple[int, int]:
+        """对消息摘要e签名，d_inv = (1+d)^-1 mod n 由调用方预先计算
+        
+        提供 nonce_pool 时优先使用预计算的 (k, x1)，池为空时现场计算。
+        """
+        while True:
+            nonce = nonce_pool.take() if nonce_pool is not None else None
+            if nonce is None:
+                nonce = self._generate_nonce()
+            k, x1 = nonce
+            
             r = (e + x1) % self.N
             
             if r == 0 or (r + k) % self.N == 0:
                 continue
             
-            # 优化的模逆计算
-            d_inv = self.mod_inverse_fast(1 + private_key, self.N)
             s = (d_inv * (k - r * private_key)) % self.N
             
             if s != 0:
@@ -221,21 +711,40 @@ class OptimizedSM2:
         if not (1 <= r < self.N and 1 <= s < self.N):
             return False
         
-        # 预计算（可缓存）
-        xa, ya = public_key
-        za = self._compute_za_from_pubkey(public_key, user_id)
+        # 公钥相关的预计算（ZA、合法性、wNAF表）从缓存获取
+        entry = self._get_pubkey_entry(public_key, user_id)
+        if not entry.valid:
+            return False
         
         # 计算消息摘要
-        m_hash = self.sm3_hash(za + message)
-        e = int.from_bytes(m_hash, 'big')
+        m_hash = self.sm3_hash(entry.za + message)
+        return self._verify_with_entry(m_hash, signature, entry)
+    
+    def verify_digest(self, digest: bytes, signature: Tuple[int, int], 
+                      public_key: Tuple[int, int], user_id: bytes = b"1234567812345678") -> bool:
+        """对预先计算好的摘要 e = SM3(ZA || M) 验签（user_id 仅用于公钥缓存）"""
+        entry = self._get_pubkey_entry(public_key, user_id)
+        if not entry.valid:
+            return False
+        return self._verify_with_entry(digest, signature, entry)
+    
+    def _verify_with_entry(self, digest: bytes, signature: Tuple[int, int], entry: PublicKeyEntry) -> bool:
+        """验签核心：检查 (e + x1) mod n == r，其中 (x1, y1) = s*G + t*PA"""
+        r, s = signature
+        if not (1 <= r < self.N and 1 <= s < self.N):
+            return False
         
+        e = int.from_bytes(digest, 'big')
         t = (r + s) % self.N
         if t == 0:
             return False
         
-        # 使用同时多标量乘法优化
-        # 计算 s*G + t*PA
-        point = self.simultaneous_multiply(s, self.G, t, public_key)
+        # 交错wNAF计算 s*G + t*PA：G使用大窗口基点表，PA使用缓存的小窗口表
+        point = self._interleaved_wnaf_jacobian([
+            (s, self._get_generator_wnaf_table(self.G_WNAF_WIDTH), self.G_WNAF_WIDTH),
+            (t, entry.wnaf_table, self.PUBKEY_WNAF_WIDTH)
+        ])
+        point = self._jacobian_to_affine(point)
         
         if point is None:
             return False
@@ -245,176 +754,571 @@ class OptimizedSM2:
         
         return v == r
     
-    def simultaneous_multiply(self, k1: int, P1: Tuple[int, int], 
-                            k2: int, P2: Tuple[int, int]) -> Optional[Tuple[int, int]]:
-        """同时多标量乘法优化（Shamir技巧）"""
-        # 预计算P1, P2, P1+P2
-        precomp = [
-            None,  # 0*P1 + 0*P2
-            P1,    # 1*P1 + 0*P2
-            P2,    # 0*P1 + 1*P2
-            self.point_add_basic(P1, P2)  # 1*P1 + 1*P2
-        ]
+    def hash_stream(self, source: StreamSource, public_key: Tuple[int, int], 
+                    user_id: bytes = b"1234567812345678", chunk_size: int = STREAM_CHUNK_SIZE) -> bytes:
+        """流式计算消息摘要 SM3(ZA || M)，内存占用与消息大小无关
         
-        result = None
-        max_bits = max(k1.bit_length(), k2.bit_length())
+        source 可以是文件路径（普通文件使用mmap）、文件对象（按块读入复用的缓冲区）或字节块的迭代器。
+        公钥不在曲线上时抛出ValueError（否则会得到不含ZA前缀的摘要）。
+        """
+        entry = self._get_pubkey_entry(public_key, user_id)
+        if not entry.valid:
+            raise ValueError("公钥不在曲线上")
+        hasher = sm3_new(entry.za)
+        update_from_stream(hasher, source, chunk_size)
+        return hasher.digest()
+    
+    def sign_digest(self, digest: bytes, private_key: int,
+                    nonce_pool: Optional["NoncePool"] = None) -> Tuple[int, int]:
+        """对预先计算好的摘要 e = SM3(ZA || M) 签名（可在上游并行计算摘要）"""
+        self._check_nonce_pool(nonce_pool)
+        d_inv = self.mod_inverse_fast(1 + private_key, self.N)
+        return self._sign_digest(int.from_bytes(digest, 'big'), private_key, d_inv, nonce_pool)
+    
+    def sign_stream(self, source: StreamSource, private_key: int, 
+                    user_id: bytes = b"1234567812345678",
+                    nonce_pool: Optional["NoncePool"] = None,
+                    chunk_size: int = STREAM_CHUNK_SIZE) -> Tuple[int, int]:
+        """流式签名大消息或文件（多次签名请使用 SigningKey.sign_stream 缓存公钥与ZA）"""
+        # 直接计算ZA，不经过验签用的公钥缓存，避免为签名者构建wNAF表并挤出验签缓存项
+        public_key = self._secret_base_multiply(private_key)
+        hasher = sm3_new(self.za_calculator.compute(public_key, user_id))
+        update_from_stream(hasher, source, chunk_size)
+        return self.sign_digest(hasher.digest(), private_key, nonce_pool)
+    
+    def verify_stream(self, source: StreamSource, signature: Tuple[int, int], 
+                      public_key: Tuple[int, int], user_id: bytes = b"1234567812345678",
+                      chunk_size: int = STREAM_CHUNK_SIZE) -> bool:
+        """流式验证大消息或文件的签名"""
+        r, s = signature
+        if not (1 <= r < self.N and 1 <= s < self.N):
+            return False
+        entry = self._get_pubkey_entry(public_key, user_id)
+        if not entry.valid:
+            return False
+        return self._verify_with_entry(self.hash_stream(source, public_key, user_id, chunk_size), signature, entry)
+    
+    def verify_batch(self, items: List[tuple]) -> List[bool]:
+        """批量SM2签名验证
         
-        for i in range(max_bits - 1, -1, -1):
-            result = self.point_add_basic(result, result) if result else None
+        items 中每项为 (message, signature, public_key[, user_id])，返回逐项的验证结果。
+        由 r 恢复 R = (x1, y1)（取y为偶数），随机选取 a_i 后检查一次多标量乘法:
+            (sum a_i*s_i) G + sum (a_i*t_i) P_i - sum a_i*R_i = O
+        等式不成立时二分查找无效签名，两半都不成立时不再细分，剩余各项逐个用 verify_optimized 验证。
+        其他实现生成的签名R的y奇偶随机，几乎所有分组都不成立，此时只比逐个验证多检查
+        整组与两个半组的批量等式；这类签名同样可以正确验证。
+        """
+        results = [False] * len(items)
+        candidates = []
+        
+        for i, item in enumerate(items):
+            message, signature, public_key = item[:3]
+            user_id = item[3] if len(item) > 3 else b"1234567812345678"
+            r, s = signature
             
-            bit1 = (k1 >> i) & 1
-            bit2 = (k2 >> i) & 1
-            index = bit1 * 2 + bit2
+            if not (1 <= r < self.N and 1 <= s < self.N):
+                continue
+            t = (r + s) % self.N
+            if t == 0:
+                continue
+            entry = self._get_pubkey_entry(public_key, user_id)
+            if not entry.valid:
+                continue
             
-            if index > 0:
-                result = self.point_add_basic(result, precomp[index])
+            candidates.append((i, r, s, t, tuple(public_key), entry.za + message))
         
-        return result
-    
-    def _compute_za(self, private_key: int, user_id: bytes) -> bytes:
-        """计算ZA值"""
-        public_key = self.point_multiply_windowed(private_key, self.G)
-        return self._compute_za_from_pubkey(public_key, user_id)
-    
-    def _compute_za_from_pubkey(self, public_key: Tuple[int, int], user_id: bytes) -> bytes:
-        """从公钥计算ZA值"""
-        entl = len(user_id) * 8
-        za_data = entl.to_bytes(2, 'big') + user_id
-        za_data += self.A.to_bytes(32, 'big') + self.B.to_bytes(32, 'big')
-        za_data += self.GX.to_bytes(32, 'big') + self.GY.to_bytes(32, 'big')
+        # 整批消息摘要一次计算（多缓冲SM3）
+        digests = sm3_hash_batch([data for *_, data in candidates])
+        prepared = []
         
-        xa, ya = public_key
-        za_data += xa.to_bytes(32, 'big') + ya.to_bytes(32, 'big')
+        for (i, r, s, t, public_key, _), digest in zip(candidates, digests):
+            e = int.from_bytes(digest, 'big')
+            
+            # x1 = r - e (mod n)，极小概率下真实的x1为 x1 + n
+            x1 = (r - e) % self.N
+            R = self._lift_x(x1)
+            if R is None and x1 + self.N < self.P:
+                R = self._lift_x(x1 + self.N)
+            if R is None:
+                continue
+            
+            prepared.append((i, s, t, public_key, R))
         
-        return self.sm3_hash(za_data)
+        self._verify_batch_bisect(prepared, items, results)
+        return results
     
-    def sm3_hash(self, data: bytes) -> bytes:
-        """SM3哈希算法（这里用SHA256替代）"""
-        return hashlib.sha256(data).digest()
-
-class PerformanceBenchmark:
-    """性能基准测试"""
+    def _verify_batch_bisect(self, group: List[tuple], items: List[tuple], results: List[bool]) -> None:
+        """批量等式成立则整组有效，否则二分定位无效签名"""
+        if len(group) > 1 and self._batch_equation_holds(group):
+            for entry in group:
+                results[entry[0]] = True
+            return
+        self._bisect_failed_group(group, items, results)
     
-    def __init__(self):
-        self.basic_sm2 = SM2()
-        self.optimized_sm2 = OptimizedSM2()
+    def _bisect_failed_group(self, group: List[tuple], items: List[tuple], results: List[bool]) -> None:
+        """group 的批量等式已不成立：一半成立则只在另一半中继续查找，两半都不成立则逐个验证"""
+        while len(group) > 1:
+            mid = len(group) // 2
+            left, right = group[:mid], group[mid:]
+            if self._batch_equation_holds(left):
+                valid, group = left, right
+            elif self._batch_equation_holds(right):
+                valid, group = right, left
+            else:
+                break
+            for entry in valid:
+                results[entry[0]] = True
+        
+        for entry in group:
+            i = entry[0]
+            results[i] = self.verify_optimized(*items[i])
     
-    def benchmark_key_generation(self, iterations: int = 100) -> dict:
-        """密钥生成性能测试"""
-        print(f"密钥生成性能测试 ({iterations} 次)...")
+    def _batch_equation_holds(self, group: List[tuple]) -> bool:
+        """检查随机线性组合 sum a_i (s_i G + t_i P_i - R_i) 是否为无穷远点"""
+        rng = random.SystemRandom()
+        g_scalar = 0
+        # 相同点（如同一公钥）的系数合并到一起
+        coefficients: Dict[Tuple[int, int], int] = {}
         
-        # 基础实现
-        start_time = time.time()
-        for _ in range(iterations):
-            self.basic_sm2.generate_keypair()
-        basic_time = time.time() - start_time
+        for _, s, t, public_key, R in group:
+            a = rng.getrandbits(128) | 1
+            g_scalar += a * s
+            coefficients[public_key] = coefficients.get(public_key, 0) + a * t
+            # -a*R 记为 a*(-R)，系数保持128位（-a mod n 是满256位的标量）
+            neg_R = (R[0], self.P - R[1])
+            coefficients[neg_R] = coefficients.get(neg_R, 0) + a
         
-        # 优化实现
-        start_time = time.time()
-        for _ in range(iterations):
-            self.optimized_sm2.generate_keypair_secure()
-        optimized_time = time.time() - start_time
+        points = list(coefficients)
+        scalars = [coefficients[P] % self.N for P in points]
         
-        return {
-            "basic_time": basic_time,
-            "optimized_time": optimized_time,
-            "speedup": basic_time / optimized_time,
-            "basic_ops_per_sec": iterations / basic_time,
-            "optimized_ops_per_sec": iterations / optimized_time
-        }
+        total = self._jacobian_add(
+            self._fixed_base_multiply_jacobian(g_scalar % self.N),
+            self._multi_scalar_jacobian(scalars, points)
+        )
+        return total is None
+    
+    def multi_scalar_multiply(self, scalars: List[int], points: List[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+        """多标量乘法 sum k_i*P_i（点数较少时用Straus，较多时用Pippenger桶方法）"""
+        if len(scalars) != len(points):
+            raise ValueError("标量与点的数量不一致")
+        return self._jacobian_to_affine(self._multi_scalar_jacobian(scalars, points))
     
-    def benchmark_signing(self, iterations: int = 100) -> dict:
-        """签名性能测试"""
-        print(f"签名性能测试 ({iterations} 次)...")
+    def _multi_scalar_jacobian(self, scalars: List[int], points: List[Tuple[int, int]]) -> Optional[Tuple[int, int, int]]:
+        """多标量乘法（Jacobian结果），根据点数选择算法与窗口大小"""
+        pairs = [(k % self.N, P) for k, P in zip(scalars, points) if P is not None and k % self.N]
+        if not pairs:
+            return None
+        scalars = [k for k, _ in pairs]
+        points = [P for _, P in pairs]
         
-        message = b"Performance test message"
+        window_size, use_pippenger = self._choose_msm_window(len(points), max(k.bit_length() for k in scalars))
+        if use_pippenger:
+            return self._multi_scalar_pippenger(scalars, points, window_size)
+        return self._multi_scalar_straus(scalars, points, window_size)
+    
+    @staticmethod
+    def _choose_msm_window(n: int, bits: int) -> Tuple[int, bool]:
+        """按点加次数估算选择窗口大小: 返回 (窗口大小, 是否使用Pippenger)
         
-        # 生成密钥
-        basic_private, _ = self.basic_sm2.generate_keypair()
-        opt_private, _ = self.optimized_sm2.generate_keypair_secure()
+        Straus:    每点预计算 2^w - 2 次点加并批量转换为仿射坐标，每窗口每点一次混合加法
+        Pippenger: 每窗口每点一次混合加法入桶，再用约 2*2^c 次点加汇总桶
+        完整点加按混合加法的1.4倍计，每个表项的仿射转换约计0.6次混合加法。
+        """
+        best = None
+        for w in range(2, 7):
+            windows = (bits + w - 1) // w
+            cost = n * (((1 << w) - 2) * 1.4 + ((1 << w) - 1) * 0.6) + windows * n
+            if best is None or cost < best[0]:
+                best = (cost, w, False)
+        for c in range(2, 17):
+            windows = (bits + c - 1) // c
+            cost = windows * (n + 2 * (1 << c) * 1.4)
+            if cost < best[0]:
+                best = (cost, c, True)
+        return best[1], best[2]
+    
+    def _multi_scalar_pippenger(self, scalars: List[int], points: List[Tuple[int, int]], 
+                                window_size: int) -> Optional[Tuple[int, int, int]]:
+        """Pippenger桶方法多标量乘法
         
-        # 基础实现
-        start_time = time.time()
-        for _ in range(iterations):
-            self.basic_sm2.sign(message, basic_private)
-        basic_time = time.time() - start_time
+        每个c位窗口中把点按窗口值放入 2^c - 1 个桶，桶内只做点加；
+        再用后缀和 sum_j j*B_j = sum_j (B_j + ... + B_max) 汇总，窗口间共用点倍。
+        """
+        bucket_count = (1 << window_size) - 1
+        max_bits = max(k.bit_length() for k in scalars)
+        windows = (max_bits + window_size - 1) // window_size
+        result = None
         
-        # 优化实现
-        start_time = time.time()
-        for _ in range(iterations):
-            self.optimized_sm2.sign_optimized(message, opt_private)
-        optimized_time = time.time() - start_time
+        for i in range(windows - 1, -1, -1):
+            for _ in range(window_size):
+                result = self._jacobian_double(result)
+            
+            shift = i * window_size
+            buckets: List[Optional[Tuple[int, int, int]]] = [None] * bucket_count
+            for k, P in zip(scalars, points):
+                d = (k >> shift) & bucket_count
+                if d:
+                    buckets[d - 1] = self._jacobian_add_mixed(buckets[d - 1], P)
+            
+            running = None
+            window_sum = None
+            for bucket in reversed(buckets):
+                running = self._jacobian_add(running, bucket)
+                window_sum = self._jacobian_add(window_sum, running)
+            
+            result = self._jacobian_add(result, window_sum)
         
-        return {
-            "basic_time": basic_time,
-            "optimized_time": optimized_time,
-            "speedup": basic_time / optimized_time,
-            "basic_ops_per_sec": iterations / basic_time,
-            "optimized_ops_per_sec": iterations / optimized_time
-        }
+        return result
     
-    def benchmark_verification(self, iterations: int = 100) -> dict:
-        """验证性能测试"""
-        print(f"签名验证性能测试 ({iterations} 次)...")
+    def _multi_scalar_straus(self, scalars: List[int], points: List[Tuple[int, int]], 
+                             window_size: int = 4) -> Optional[Tuple[int, int, int]]:
+        """Straus交错窗口多标量乘法 sum k_i*P_i，所有点共用同一串点倍运算"""
+        row_size = (1 << window_size) - 1
         
-        message = b"Performance test message"
+        # 每个点预计算 P, 2P, ..., (2^w - 1)P，统一做一次批量求逆
+        jacobian_points = []
+        for P in points:
+            base = self._to_jacobian(P)
+            row_point = base
+            jacobian_points.append(row_point)
+            for _ in range(row_size - 1):
+                row_point = self._jacobian_add(row_point, base)
+                jacobian_points.append(row_point)
+        affine_points = self._batch_to_affine(jacobian_points)
+        tables = [affine_points[i * row_size:(i + 1) * row_size] for i in range(len(points))]
         
-        # 准备测试数据
-        basic_private, basic_public = self.basic_sm2.generate_keypair()
-        opt_private, opt_public = self.optimized_sm2.generate_keypair_secure()
+        max_bits = max((k.bit_length() for k in scalars), default=0)
+        windows = (max_bits + window_size - 1) // window_size
+        mask = row_size
+        result = None
         
-        basic_sig = self.basic_sm2.sign(message, basic_private)
-        opt_sig = self.optimized_sm2.sign_optimized(message, opt_private)
+        for i in range(windows - 1, -1, -1):
+            for _ in range(window_size):
+                result = self._jacobian_double(result)
+            shift = i * window_size
+            for k, table in zip(scalars, tables):
+                d = (k >> shift) & mask
+                if d:
+                    result = self._jacobian_add_mixed(result, table[d - 1])
         
-        # 基础实现
-        start_time = time.time()
-        for _ in range(iterations):
-            self.basic_sm2.verify(message, basic_sig, basic_public)
-        basic_time = time.time() - start_time
+        return result
+    
+    def _lift_x(self, x: int) -> Optional[Tuple[int, int]]:
+        """由x坐标恢复y为偶数的曲线点（p ≡ 3 mod 4，y = rhs^((p+1)/4)）"""
+        y = self.field.sqrt(x * x * x + self.A * x + self.B)
+        if y is None:
+            return None
+        if y & 1:
+            y = self.P - y
+        return (x, y)
+    
+    def _get_pubkey_entry(self, public_key: Tuple[int, int], user_id: bytes) -> PublicKeyEntry:
+        """获取公钥预计算项，未命中时计算并放入缓存（公钥可为列表，按元组作为缓存键）"""
+        if public_key is not None:
+            public_key = tuple(public_key)
+        key = (public_key, user_id)
+        entry = self.pubkey_cache.get(key)
+        if entry is not None:
+            return entry
         
-        # 优化实现
-        start_time = time.time()
-        for _ in range(iterations):
-            self.optimized_sm2.verify_optimized(message, opt_sig, opt_public)
-        optimized_time = time.time() - start_time
+        valid = self.is_on_curve(public_key)
+        if valid:
+            za = self._compute_za_from_pubkey(public_key, user_id)
+            wnaf_table = self._batch_to_affine(self._compute_odd_multiples(public_key, self.PUBKEY_WNAF_WIDTH - 1))
+        else:
+            za, wnaf_table = b"", []
         
-        return {
-            "basic_time": basic_time,
-            "optimized_time": optimized_time,
-            "speedup": basic_time / optimized_time,
-            "basic_ops_per_sec": iterations / basic_time,
-            "optimized_ops_per_sec": iterations / optimized_time
-        }
+        entry = PublicKeyEntry(za, valid, wnaf_table)
+        self.pubkey_cache.put(key, entry)
+        return entry
+    
+    def is_on_curve(self, P: Optional[Tuple[int, int]]) -> bool:
+        """检查点是否为曲线上的有限点: y^2 = x^3 + ax + b (mod p)"""
+        if P is None:
+            return False
+        x, y = P
+        if not (0 <= x < self.P and 0 <= y < self.P):
+            return False
+        return (y * y - (x * x * x + self.A * x + self.B)) % self.P == 0
     
-    def run_full_benchmark(self) -> dict:
-        """运行完整的性能基准测试"""
-        print("=" * 60)
-        print("SM2算法性能基准测试")
-        print("=" * 60)
+    def encode_point(self, P: Optional[Tuple[int, int]], compressed: bool = True) -> bytes:
+        """SEC1点编码：压缩 02/03||x（33字节），非压缩 04||x||y（65字节），无穷远点 00"""
+        if P is None:
+            return b"\x00"
+        x, y = P
+        if compressed:
+            return bytes([2 | (y & 1)]) + x.to_bytes(self.COORD_SIZE, 'big')
+        return b"\x04" + x.to_bytes(self.COORD_SIZE, 'big') + y.to_bytes(self.COORD_SIZE, 'big')
+    
+    def decode_point(self, data: bytes) -> Tuple[int, int]:
+        """SEC1点解码，返回曲线上的有限点；编码非法或点不在曲线上时抛出ValueError"""
+        data = bytes(data)
+        if not data:
+            raise ValueError("点编码为空")
+        prefix = data[0]
+        size = self.COORD_SIZE
         
-        keygen_results = self.benchmark_key_generation(50)
-        print(f"密钥生成加速比: {keygen_results['speedup']:.2f}x")
-        print(f"优化版本: {keygen_results['optimized_ops_per_sec']:.2f} 密钥对/秒")
-        print()
+        if prefix == 0x04:
+            if len(data) != 1 + 2 * size:
+                raise ValueError("非压缩点编码长度错误")
+            point = (int.from_bytes(data[1:1 + size], 'big'), int.from_bytes(data[1 + size:], 'big'))
+            if not self.is_on_curve(point):
+                raise ValueError("点不在曲线上")
+            return point
         
-        sign_results = self.benchmark_signing(50)
-        print(f"签名加速比: {sign_results['speedup']:.2f}x")
-        print(f"优化版本: {sign_results['optimized_ops_per_sec']:.2f} 签名/秒")
-        print()
+        if prefix in (0x02, 0x03):
+            if len(data) != 1 + size:
+                raise ValueError("压缩点编码长度错误")
+            point = self.point_cache.get(data)
+            if point is not None:
+                return point
+            x = int.from_bytes(data[1:], 'big')
+            if x >= self.P:
+                raise ValueError("点不在曲线上")
+            point = self._lift_x(x)
+            if point is None:
+                raise ValueError("点不在曲线上")
+            if (point[1] & 1) != (prefix & 1):
+                point = (x, self.P - point[1])
+            self.point_cache.put(data, point)
+            return point
         
-        verify_results = self.benchmark_verification(50)
-        print(f"验证加速比: {verify_results['speedup']:.2f}x")
-        print(f"优化版本: {verify_results['optimized_ops_per_sec']:.2f} 验证/秒")
+        if prefix == 0x00:
+            raise ValueError("无穷远点不是合法公钥")
+        raise ValueError(f"未知的点编码前缀: {prefix:#04x}")
+    
+    def decode_points(self, buffer: bytes) -> List[Tuple[int, int]]:
+        """批量解码连续存放的多个点编码（压缩与非压缩可混合），不复制整个缓冲区"""
+        view = memoryview(buffer)
+        size = self.COORD_SIZE
+        points = []
+        offset = 0
+        while offset < len(view):
+            length = 1 + 2 * size if view[offset] == 0x04 else 1 + size
+            if offset + length > len(view):
+                raise ValueError("点编码被截断")
+            points.append(self.decode_point(view[offset:offset + length]))
+            offset += length
+        return points
+    
+    def _wnaf(self, k: int, width: int) -> List[int]:
+        """计算k的宽度为w的NAF表示（低位在前），非零数字为奇数且 |d| < 2^(w-1)"""
+        digits = []
+        full = 1 << width
+        half = full >> 1
+        
+        while k > 0:
+            if k & 1:
+                d = k & (full - 1)
+                if d >= half:
+                    d -= full
+                k -= d
+            else:
+                d = 0
+            digits.append(d)
+            k >>= 1
         
+        return digits
+    
+    def _wnaf_multiply_jacobian(self, k: int, odd_table: List[Tuple[int, int]], 
+                                width: int) -> Optional[Tuple[int, int, int]]:
+        """使用奇数倍点表的wNAF标量乘法，结果为Jacobian坐标"""
+        return self._interleaved_wnaf_jacobian([(k, odd_table, width)])
+    
+    def _interleaved_wnaf_jacobian(self, terms: List[Tuple[int, List[Tuple[int, int]], int]]) -> Optional[Tuple[int, int, int]]:
+        """交错wNAF多标量乘法 sum k_i*P_i
+        
+        terms 中每项为 (k, 奇数倍点表, 窗口宽度)，各项可使用不同的窗口宽度，
+        所有项共用同一串点倍运算。
+        """
+        p = self.P
+        expansions = [(self._wnaf(k, width), table) for k, table, width in terms]
+        length = max((len(digits) for digits, _ in expansions), default=0)
+        result = None
+        
+        for i in range(length - 1, -1, -1):
+            result = self._jacobian_double(result)
+            for digits, table in expansions:
+                if i >= len(digits):
+                    continue
+                d = digits[i]
+                if d > 0:
+                    result = self._jacobian_add_mixed(result, table[d >> 1])
+                elif d < 0:
+                    x, y = table[(-d) >> 1]
+                    result = self._jacobian_add_mixed(result, (x, p - y))
+        
+        return result
+    
+    def _get_generator_wnaf_table(self, width: int) -> List[Tuple[int, int]]:
+        """获取基点的奇数倍点表 [G, 3G, ..., (2^(w-1) - 1)G]（进程内缓存）"""
+        cls = type(self)
+        key = (self.curve, width)
+        table = cls._generator_wnaf_tables.get(key)
+        if table is None:
+            table = self._batch_to_affine(self._compute_odd_multiples(self.G, width - 1))
+            cls._generator_wnaf_tables[key] = table
+        return table
+    
+    def _wnaf_term(self, k: int, P: Tuple[int, int]) -> Tuple[int, List[Tuple[int, int]], int]:
+        """为交错wNAF构造 (k, 奇数倍点表, 窗口宽度)：基点使用大窗口的缓存表"""
+        if P == self.G:
+            return (k, self._get_generator_wnaf_table(self.G_WNAF_WIDTH), self.G_WNAF_WIDTH)
+        width = self.PUBKEY_WNAF_WIDTH
+        return (k, self._batch_to_affine(self._compute_odd_multiples(P, width - 1)), width)
+    
+    def simultaneous_multiply(self, k1: int, P1: Tuple[int, int], 
+                            k2: int, P2: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """同时多标量乘法优化（交错wNAF，基点与其他点分别使用不同窗口宽度）"""
+        terms = [self._wnaf_term(k1, P1), self._wnaf_term(k2, P2)]
+        return self._jacobian_to_affine(self._interleaved_wnaf_jacobian(terms))
+    
+    def _compute_za(self, private_key: int, user_id: bytes) -> bytes:
+        """计算ZA值"""
+        public_key = self._secret_base_multiply(private_key)
+        return self._compute_za_from_pubkey(public_key, user_id)
+    
+    def _compute_za_from_pubkey(self, public_key: Tuple[int, int], user_id: bytes) -> bytes:
+        """从公钥计算ZA值（见 sm2_za.ZACalculator）"""
+        return self.za_calculator.compute(public_key, user_id)
+    
+    def sm3_hash(self, data: bytes) -> bytes:
+        """SM3哈希算法（后端见 sm3_backend）"""
+        return sm3_hash(data)
+
+class NoncePool:
+    """签名随机数预计算池
+    
+    后台线程预先计算 (k, x1) 对并放入有界队列，签名时取出一对使用一次后即丢弃，
+    请求路径上只剩模运算。池为空时由调用方现场计算。
+    """
+    
+    def __init__(self, sm2: Optional[OptimizedSM2] = None, depth: int = 256):
+        self.sm2 = sm2 if sm2 is not None else OptimizedSM2()
+        self.depth = depth
+        self._queue: "queue.Queue[Tuple[int, int]]" = queue.Queue(maxsize=depth)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 统计信息
+        self.produced = 0
+        self.consumed = 0
+        self.fallbacks = 0
+        self._busy_time = 0.0
+    
+    def start(self) -> "NoncePool":
+        """启动后台填充线程"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._fill, name="sm2-nonce-pool", daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止后台线程并丢弃池中剩余的随机数"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+    
+    def __enter__(self) -> "NoncePool":
+        return self.start()
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+    
+    def _fill(self) -> None:
+        """后台线程：持续补充随机数直到池满"""
+        while not self._stop_event.is_set():
+            start_time = time.perf_counter()
+            nonce = self.sm2._generate_nonce()
+            self._busy_time += time.perf_counter() - start_time
+            
+            while not self._stop_event.is_set():
+                try:
+                    self._queue.put(nonce, timeout=0.1)
+                except queue.Full:
+                    continue
+                self.produced += 1
+                break
+    
+    def take(self) -> Optional[Tuple[int, int]]:
+        """取出一对 (k, x1)；池为空时返回None"""
+        try:
+            nonce = self._queue.get_nowait()
+        except queue.Empty:
+            self.fallbacks += 1
+            return None
+        self.consumed += 1
+        return nonce
+    
+    def stats(self) -> dict:
+        """池深度与补充速率统计"""
         return {
-            "key_generation": keygen_results,
-            "signing": sign_results,
-            "verification": verify_results
+            "depth": self._queue.qsize(),
+            "capacity": self.depth,
+            "produced": self.produced,
+            "consumed": self.consumed,
+            "fallbacks": self.fallbacks,
+            "refill_rate": self.produced / self._busy_time if self._busy_time else 0.0
         }
 
-# 运行基准测试
+class SigningKey:
+    """SM2签名私钥对象，缓存与私钥相关的派生值，适合同一私钥的多次签名"""
+    
+    def __init__(self, private_key: int, sm2: Optional[OptimizedSM2] = None,
+                 nonce_pool: Optional[NoncePool] = None):
+        self.sm2 = sm2 if sm2 is not None else OptimizedSM2()
+        self.sm2._check_nonce_pool(nonce_pool)
+        self.nonce_pool = nonce_pool
+        if not 1 <= private_key < self.sm2.N - 1:
+            raise ValueError("私钥超出范围 [1, n-2]")
+        
+        self.private_key = private_key
+        # 公钥与 (1+d)^-1 mod n 只计算一次
+        self.public_key = self.sm2._secret_base_multiply(private_key)
+        self.d_inv = self.sm2.mod_inverse_fast(1 + private_key, self.sm2.N)
+        # 每个用户ID对应的ZA
+        self._za_cache: Dict[bytes, bytes] = {}
+    
+    def za(self, user_id: bytes = b"1234567812345678") -> bytes:
+        """获取（并缓存）指定用户ID的ZA值"""
+        za = self._za_cache.get(user_id)
+        if za is None:
+            za = self.sm2._compute_za_from_pubkey(self.public_key, user_id)
+            self._za_cache[user_id] = za
+        return za
+    
+    def sign(self, message: bytes, user_id: bytes = b"1234567812345678") -> Tuple[int, int]:
+        """SM2签名"""
+        e = int.from_bytes(self.sm2.sm3_hash(self.za(user_id) + message), 'big')
+        return self.sm2._sign_digest(e, self.private_key, self.d_inv, self.nonce_pool)
+    
+    def sign_digest(self, digest: bytes) -> Tuple[int, int]:
+        """对预先计算好的摘要 SM3(ZA || M) 签名"""
+        return self.sm2._sign_digest(int.from_bytes(digest, 'big'), self.private_key, self.d_inv, self.nonce_pool)
+    
+    def sign_stream(self, source: StreamSource, user_id: bytes = b"1234567812345678",
+                    chunk_size: int = STREAM_CHUNK_SIZE) -> Tuple[int, int]:
+        """流式签名大消息或文件（ZA使用缓存）"""
+        hasher = sm3_new(self.za(user_id))
+        update_from_stream(hasher, source, chunk_size)
+        return self.sign_digest(hasher.digest())
+    
+    def sign_many(self, messages: List[bytes], user_id: bytes = b"1234567812345678") -> List[Tuple[int, int]]:
+        """批量签名多条消息（随机点kG共用一次模逆）"""
+        za = self.za(user_id)
+        digests = [int.from_bytes(h, 'big') for h in sm3_hash_batch([za + message for message in messages])]
+        return self.sm2._sign_digests(digests, self.private_key, self.d_inv, self.nonce_pool)
+
+
+# 运行基准测试（完整的基准测试套件见 sm2_benchmark.py）
 if __name__ == "__main__":
-    from sm2_implementation import SM2  # 导入基础实现
+    import sys
+    from sm2_benchmark import main
     
-    benchmark = PerformanceBenchmark()
-    results = benchmark.run_full_benchmark()
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sm2_curve import CurveParams, SM2_RECOMMENDED
+from sm2_optimized import OptimizedSM2, SigningKey
+
+# 工作进程内的全局状态（由 _init_worker 在进程启动时初始化一次）
+_worker_sm2: Optional[OptimizedSM2] = None
+
+
+def _init_worker(window_size: int, table_path: Optional[str], curve: CurveParams = SM2_RECOMMENDED) -> None:
+    """工作进程初始化：加载（或计算）基点预计算表"""
+    global _worker_sm2
+    _worker_sm2 = OptimizedSM2(window_size=window_size, table_path=table_path, curve=curve)
+
+
+@lru_cache(maxsize=1024)
+def _worker_signing_key(private_key: int) -> SigningKey:
+    """工作进程内缓存SigningKey，同一私钥只计算一次公钥与(1+d)^-1"""
+    return SigningKey(private_key, _worker_sm2)
+
+
+def _sign_chunk(chunk: List[tuple]) -> Tuple[int, int, List[Tuple[int, int]]]:
+    """签名一个分块，返回 (进程ID, 耗时ns, 签名列表)"""
+    start = time.perf_counter_ns()
+    signatures = []
+    for item in chunk:
+        message, private_key = item[:2]
+        user_id = item[2] if len(item) > 2 else b"1234567812345678"
+        signatures.append(_worker_signing_key(private_key).sign(message, user_id))
+    return os.getpid(), time.perf_counter_ns() - start, signatures
+
+
+def _verify_chunk(chunk: List[tuple]) -> Tuple[int, int, List[bool]]:
+    """批量验证一个分块，返回 (进程ID, 耗时ns, 验证结果列表)"""
+    start = time.perf_counter_ns()
+    results = _worker_sm2.verify_batch(chunk)
+    return os.getpid(), time.perf_counter_ns() - start, results
+
+
+class ParallelSM2:
+    """基于进程池的SM2并行签名/验签执行器
+
+    绕过GIL，将请求分块后分发到多个进程；每个工作进程启动时只加载一次预计算表，
+    分块提交以摊薄进程间通信开销，结果按提交顺序返回。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, chunk_size: int = 64,
+                 window_size: int = 4, table_path: Optional[str] = None,
+                 curve: CurveParams = SM2_RECOMMENDED):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+        # 预先在主进程生成表文件，工作进程直接通过mmap加载
+        # （表可能来自进程内缓存，不依赖构造时的写文件副作用，缺失时显式保存）
+        if table_path is not None and not os.path.exists(table_path):
+            OptimizedSM2(window_size=window_size, curve=curve).save_precomputed_table(table_path)
+
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             initializer=_init_worker,
+                                             initargs=(window_size, table_path, curve))
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._busy_ns: Dict[int, int] = {}
+        self._started_at = time.perf_counter_ns()
+
+    def __enter__(self) -> "ParallelSM2":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.shutdown()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭进程池"""
+        self._executor.shutdown(wait=wait)
+
+    def _chunks(self, items: List[tuple]) -> List[List[tuple]]:
+        return [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+
+    def _submit(self, func, chunk: List[tuple]) -> Future:
+        with self._lock:
+            self._pending += 1
+            self._submitted += 1
+        future = self._executor.submit(func, chunk)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            if not future.cancelled() and future.exception() is None:
+                pid, busy_ns, _ = future.result()
+                self._busy_ns[pid] = self._busy_ns.get(pid, 0) + busy_ns
+
+    def _run(self, func, items: List[tuple]) -> list:
+        futures = [self._submit(func, chunk) for chunk in self._chunks(list(items))]
+        results = []
+        for future in futures:
+            results.extend(future.result()[2])
+        return results
+
+    def sign_many(self, items: List[tuple]) -> List[Tuple[int, int]]:
+        """并行签名，items 中每项为 (message, private_key[, user_id])，结果按顺序返回"""
+        return self._run(_sign_chunk, items)
+
+    def verify_many(self, items: List[tuple]) -> List[bool]:
+        """并行验签，items 中每项为 (message, signature, public_key[, user_id])，结果按顺序返回"""
+        return self._run(_verify_chunk, items)
+
+    def stats(self) -> dict:
+        """队列深度与各工作进程利用率（忙碌时间 / 执行器运行时间）"""
+        elapsed = time.perf_counter_ns() - self._started_at
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self._pending,
+                "submitted_chunks": self._submitted,
+                "completed_chunks": self._completed,
+                "worker_utilization": {pid: busy / elapsed for pid, busy in self._busy_ns.items()}
+            }
+
+
+if __name__ == "__main__":
+    sm2 = OptimizedSM2()
+    keypairs = sm2.generate_keypairs(8)
+    messages = [f"message {i}".encode() for i in range(512)]
+
+    with ParallelSM2() as executor:
+        start = time.perf_counter()
+        signatures = executor.sign_many([(m, keypairs[i % 8][0]) for i, m in enumerate(messages)])
+        sign_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = executor.verify_many([(m, sig, keypairs[i % 8][1])
+                                        for i, (m, sig) in enumerate(zip(messages, signatures))])
+        verify_time = time.perf_counter() - start
+
+        print(f"工作进程数: {executor.max_workers}")
+        print(f"并行签名: {len(messages) / sign_time:.2f} 签名/秒")
+        print(f"并行验证: {len(messages) / verify_time:.2f} 验证/秒，全部通过: {all(results)}")
+        print(f"执行器状态: {executor.stats()}")
@@ -0,0 +1,307 @@
+import asyncio
+import itertools
+import struct
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from sm2_optimized import OptimizedSM2, SigningKey
+from sm2_parallel import ParallelSM2
+
+# 帧格式: 操作码(1B) | 请求ID(4B) | 负载长度(4B) | 负载
+FRAME_HEADER = struct.Struct(">BII")
+MAX_PAYLOAD = 64 * 1024 * 1024
+
+OP_SIGN = 0x01
+OP_VERIFY = 0x02
+OP_SIGN_RESULT = 0x81
+OP_VERIFY_RESULT = 0x82
+OP_ERROR = 0xFF
+
+DEFAULT_USER_ID = b"1234567812345678"
+
+
+class ServiceError(Exception):
+    """服务端返回的错误"""
+
+
+def encode_sign_request(key_id: bytes, message: bytes, user_id: bytes = DEFAULT_USER_ID) -> bytes:
+    """签名请求负载: key_id长度(1B) | key_id | user_id长度(2B) | user_id | 消息"""
+    return bytes([len(key_id)]) + key_id + len(user_id).to_bytes(2, 'big') + user_id + message
+
+
+def decode_sign_request(payload: bytes) -> Tuple[bytes, bytes, bytes]:
+    key_len = payload[0]
+    key_id = payload[1:1 + key_len]
+    offset = 1 + key_len
+    uid_len = int.from_bytes(payload[offset:offset + 2], 'big')
+    offset += 2
+    user_id = payload[offset:offset + uid_len]
+    return key_id, payload[offset + uid_len:], user_id
+
+
+def encode_verify_request(message: bytes, signature: Tuple[int, int], public_key: Tuple[int, int],
+                          user_id: bytes = DEFAULT_USER_ID) -> bytes:
+    """验签请求负载: 公钥(x||y, 64B) | r(32B) | s(32B) | user_id长度(2B) | user_id | 消息"""
+    (x, y), (r, s) = public_key, signature
+    return (x.to_bytes(32, 'big') + y.to_bytes(32, 'big') + r.to_bytes(32, 'big') + s.to_bytes(32, 'big')
+            + len(user_id).to_bytes(2, 'big') + user_id + message)
+
+
+def decode_verify_request(payload: bytes) -> Tuple[bytes, Tuple[int, int], Tuple[int, int], bytes]:
+    x, y, r, s = (int.from_bytes(payload[i:i + 32], 'big') for i in range(0, 128, 32))
+    uid_len = int.from_bytes(payload[128:130], 'big')
+    user_id = payload[130:130 + uid_len]
+    return payload[130 + uid_len:], (r, s), (x, y), user_id
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Tuple[int, int, bytes]]:
+    """读取一帧，连接关闭时返回None"""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    op, request_id, length = FRAME_HEADER.unpack(header)
+    if length > MAX_PAYLOAD:
+        raise ValueError("帧长度超出限制")
+    payload = await reader.readexactly(length)
+    return op, request_id, payload
+
+
+def pack_frame(op: int, request_id: int, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(op, request_id, len(payload)) + payload
+
+
+class SM2Service:
+    """asyncio SM2签名/验签服务
+
+    多个应用进程通过Unix套接字或本地TCP共享同一份预热的预计算表与密钥缓存。
+    同一连接上可流水线发送多个请求，响应按请求ID匹配（可能乱序返回）；
+    并发到达的验签请求被合并为微批次，交给 verify_batch 或进程池处理。
+    """
+
+    def __init__(self, signing_keys: Optional[Dict[bytes, int]] = None,
+                 sm2: Optional[OptimizedSM2] = None,
+                 batch_size: int = 64, batch_delay: float = 0.002,
+                 executor: Optional[Executor] = None,
+                 worker_pool: Optional[ParallelSM2] = None):
+        self.sm2 = sm2 if sm2 is not None else OptimizedSM2()
+        self.signing_keys = {key_id: SigningKey(d, self.sm2) for key_id, d in (signing_keys or {}).items()}
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        # CPU密集的运算放到线程池（或进程池）中执行，避免阻塞事件循环；自建的线程池在 close() 时关闭
+        self._owns_executor = executor is None
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=1)
+        self.worker_pool = worker_pool
+
+        self._verify_queue: List[Tuple[tuple, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: Set[asyncio.Future] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.batches = 0
+        self.batched_requests = 0
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=path)
+        return self._server
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def close(self) -> None:
+        """停止监听，处理完已排队的验签批次，并关闭服务自建的线程池（外部传入的执行器由调用方关闭）"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._flush_verify_queue()
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个持久连接：逐帧读取并并发处理，响应按完成顺序写回"""
+        tasks = set()
+        write_lock = asyncio.Lock()
+        try:
+            while True:
+                try:
+                    frame = await read_frame(reader)
+                except ValueError:
+                    break
+                if frame is None:
+                    break
+                task = asyncio.ensure_future(self._handle_request(frame, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def _handle_request(self, frame: Tuple[int, int, bytes], writer: asyncio.StreamWriter,
+                              write_lock: asyncio.Lock) -> None:
+        op, request_id, payload = frame
+        try:
+            if op == OP_SIGN:
+                r, s = await self._sign(*decode_sign_request(payload))
+                response = pack_frame(OP_SIGN_RESULT, request_id, r.to_bytes(32, 'big') + s.to_bytes(32, 'big'))
+            elif op == OP_VERIFY:
+                valid = await self._verify(decode_verify_request(payload))
+                response = pack_frame(OP_VERIFY_RESULT, request_id, b"\x01" if valid else b"\x00")
+            else:
+                raise ValueError(f"未知操作码: {op}")
+        except Exception as exc:
+            response = pack_frame(OP_ERROR, request_id, str(exc).encode('utf-8'))
+
+        async with write_lock:
+            writer.write(response)
+            await writer.drain()
+
+    async def _sign(self, key_id: bytes, message: bytes, user_id: bytes) -> Tuple[int, int]:
+        signing_key = self.signing_keys.get(key_id)
+        if signing_key is None:
+            raise ValueError(f"未知密钥: {key_id!r}")
+        loop = asyncio.get_running_loop()
+        if self.worker_pool is not None:
+            signatures = await loop.run_in_executor(
+                None, self.worker_pool.sign_many, [(message, signing_key.private_key, user_id)])
+            return signatures[0]
+        return await loop.run_in_executor(self.executor, signing_key.sign, message, user_id)
+
+    def _verify(self, item: tuple) -> asyncio.Future:
+        """验签请求进入合并队列，凑满一批或等待 batch_delay 后统一处理"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._verify_queue.append((item, future))
+
+        if len(self._verify_queue) >= self.batch_size:
+            self._flush_verify_queue()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_delay, self._flush_verify_queue)
+        return future
+
+    def _flush_verify_queue(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._verify_queue:
+            return
+
+        batch, self._verify_queue = self._verify_queue, []
+        self.batches += 1
+        self.batched_requests += len(batch)
+        task = asyncio.ensure_future(self._run_verify_batch(batch))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_verify_batch(self, batch: List[Tuple[tuple, asyncio.Future]]) -> None:
+        items = [item for item, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            if self.worker_pool is not None:
+                results = await loop.run_in_executor(None, self.worker_pool.verify_many, items)
+            else:
+                results = await loop.run_in_executor(self.executor, self.sm2.verify_batch, items)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), valid in zip(batch, results):
+            if not future.done():
+                future.set_result(valid)
+
+    def stats(self) -> dict:
+        """微批次合并统计与公钥缓存统计"""
+        return {
+            "batches": self.batches,
+            "batched_requests": self.batched_requests,
+            "average_batch_size": self.batched_requests / self.batches if self.batches else 0.0,
+            "pending_verifications": len(self._verify_queue),
+            "pubkey_cache": self.sm2.pubkey_cache.stats()
+        }
+
+
+class SM2Client:
+    """SM2服务客户端：单个持久连接上流水线发送请求"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._request_ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader_task = asyncio.ensure_future(self._read_responses())
+
+    @classmethod
+    async def connect_unix(cls, path: str) -> "SM2Client":
+        reader, writer = await asyncio.open_unix_connection(path)
+        return cls(reader, writer)
+
+    @classmethod
+    async def connect_tcp(cls, host: str, port: int) -> "SM2Client":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._reader_task.cancel()
+
+    async def _read_responses(self) -> None:
+        while True:
+            frame = await read_frame(self._reader)
+            if frame is None:
+                break
+            op, request_id, payload = frame
+            future = self._pending.pop(request_id, None)
+            if future is None or future.done():
+                continue
+            if op == OP_ERROR:
+                future.set_exception(ServiceError(payload.decode('utf-8', 'replace')))
+            else:
+                future.set_result((op, payload))
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("连接已关闭"))
+        self._pending.clear()
+
+    async def _request(self, op: int, payload: bytes) -> Tuple[int, bytes]:
+        request_id = next(self._request_ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write(pack_frame(op, request_id, payload))
+        await self._writer.drain()
+        return await future
+
+    async def sign(self, key_id: bytes, message: bytes, user_id: bytes = DEFAULT_USER_ID) -> Tuple[int, int]:
+        _, payload = await self._request(OP_SIGN, encode_sign_request(key_id, message, user_id))
+        return int.from_bytes(payload[:32], 'big'), int.from_bytes(payload[32:64], 'big')
+
+    async def verify(self, message: bytes, signature: Tuple[int, int], public_key: Tuple[int, int],
+                     user_id: bytes = DEFAULT_USER_ID) -> bool:
+        _, payload = await self._request(OP_VERIFY, encode_verify_request(message, signature, public_key, user_id))
+        return payload == b"\x01"
+
+
+async def _demo() -> None:
+    sm2 = OptimizedSM2()
+    private_key, public_key = sm2.generate_keypair_secure()
+    service = SM2Service({b"demo": private_key}, sm2)
+    server = await service.start_tcp()
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"SM2服务已启动: {host}:{port}")
+
+    client = await SM2Client.connect_tcp(host, port)
+    messages = [f"message {i}".encode() for i in range(200)]
+    signatures = await asyncio.gather(*(client.sign(b"demo", m) for m in messages))
+    results = await asyncio.gather(*(client.verify(m, sig, public_key) for m, sig in zip(messages, signatures)))
+    print(f"流水线验签 {len(results)} 条，全部通过: {all(results)}")
+    print(f"服务状态: {service.stats()}")
+
+    await client.close()
+    await service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
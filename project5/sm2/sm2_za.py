@@ -0,0 +1,230 @@
+import mmap
+import os
+import struct
+import threading
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+from sm2_curve import CurveParams, SM2_RECOMMENDED
+from sm2_memo import LRUCache
+from sm3_backend import get_backend, sm3_hash_batch, new as sm3_new
+
+DEFAULT_USER_ID = b"1234567812345678"
+
+# ZA注册表文件格式: 魔数 | 版本 | 曲线指纹，随后每条记录为
+# user_id长度(2B) | user_id | 公钥(x||y) | ZA(32B)，新记录直接追加在文件末尾
+REGISTRY_MAGIC = b"SM2ZAREG"
+REGISTRY_VERSION = 1
+REGISTRY_HEADER = struct.Struct(">8sH32s")
+ZA_SIZE = 32
+
+
+class ZACalculator:
+    """ZA = SM3(ENTL || ID || a || b || Gx || Gy || xA || yA) 的计算
+
+    对每个用户ID缓存吸收完 ENTL||ID||a||b||Gx||Gy 之后的SM3状态，
+    计算ZA时复制该状态再吸收公钥坐标（默认ID下每个ZA从4次压缩降为2次）；
+    提供 registry 时优先查注册表，命中时不做任何哈希运算。
+    """
+
+    def __init__(self, curve: CurveParams = SM2_RECOMMENDED, registry: Optional["ZARegistry"] = None,
+                 prefix_cache_size: int = 1024):
+        if registry is not None and registry.curve.fingerprint() != curve.fingerprint():
+            raise ValueError("ZA注册表与当前曲线参数不匹配")
+        self.curve = curve
+        self.coord_size = curve.coord_size
+        self._curve_block = b"".join(v.to_bytes(self.coord_size, 'big')
+                                     for v in (curve.a, curve.b, curve.gx, curve.gy))
+        self._prefixes = LRUCache(prefix_cache_size)
+        self.registry = registry
+
+    def prefix_state(self, user_id: bytes):
+        """返回已吸收 ENTL||ID||a||b||Gx||Gy 的SM3对象（调用方可继续 update）"""
+        state = self._prefixes.get(user_id)
+        if state is None:
+            entl = len(user_id) * 8
+            if entl > 0xFFFF:
+                raise ValueError("用户ID过长（ENTL为16位）")
+            state = sm3_new(entl.to_bytes(2, 'big') + bytes(user_id) + self._curve_block)
+            self._prefixes.put(user_id, state)
+        return state.copy()
+
+    def encode_public_key(self, public_key: Tuple[int, int]) -> bytes:
+        x, y = public_key
+        return x.to_bytes(self.coord_size, 'big') + y.to_bytes(self.coord_size, 'big')
+
+    def compute(self, public_key: Tuple[int, int], user_id: bytes = DEFAULT_USER_ID) -> bytes:
+        """计算ZA（32字节）"""
+        if self.registry is not None:
+            za = self.registry.get(public_key, user_id)
+            if za is not None:
+                return za
+        state = self.prefix_state(user_id)
+        state.update(self.encode_public_key(public_key))
+        return state.digest()
+
+    def compute_many(self, items: Iterable[Tuple[bytes, Tuple[int, int]]]) -> List[bytes]:
+        """批量计算 [(user_id, 公钥)] 的ZA（不查注册表）
+
+        纯Python后端下整批走多缓冲SM3，hashlib后端下逐个复制前缀状态。
+        """
+        items = list(items)
+        if get_backend() == "hashlib":
+            zas = []
+            for user_id, public_key in items:
+                state = self.prefix_state(user_id)
+                state.update(self.encode_public_key(public_key))
+                zas.append(state.digest())
+            return zas
+
+        data = []
+        for user_id, public_key in items:
+            self.prefix_state(user_id)  # 校验ID长度
+            data.append((len(user_id) * 8).to_bytes(2, 'big') + bytes(user_id) + self._curve_block
+                        + self.encode_public_key(public_key))
+        return sm3_hash_batch(data)
+
+
+class ZARegistry:
+    """持久化的 (user_id, 公钥) -> ZA 注册表
+
+    内存中以 user_id||x||y 为键（坐标定长，键无歧义）；指定 path 时从文件加载，
+    之后新增的记录追加写入同一文件。文件头带曲线指纹，防止加载其他曲线的ZA。
+    """
+
+    def __init__(self, curve: CurveParams = SM2_RECOMMENDED, path: Optional[str] = None):
+        self.curve = curve
+        self.path = path
+        self._calculator = ZACalculator(curve)
+        self._entries: Dict[bytes, bytes] = {}
+        self._lock = threading.Lock()
+        self._file: Optional[BinaryIO] = None
+        # 已加载文件中完整记录的末尾位置，追加前截掉之后不完整的记录
+        self._valid_size: Optional[int] = None
+        if path is not None and os.path.exists(path) and os.path.getsize(path) > 0:
+            self.load(path)
+
+    def _key(self, public_key: Tuple[int, int], user_id: bytes) -> bytes:
+        return bytes(user_id) + self._calculator.encode_public_key(public_key)
+
+    def get(self, public_key: Tuple[int, int], user_id: bytes = DEFAULT_USER_ID) -> Optional[bytes]:
+        return self._entries.get(self._key(public_key, user_id))
+
+    def __contains__(self, item: Tuple[Tuple[int, int], bytes]) -> bool:
+        public_key, user_id = item
+        return self._key(public_key, user_id) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, public_key: Tuple[int, int], user_id: bytes = DEFAULT_USER_ID) -> bytes:
+        """注册一个用户，返回其ZA"""
+        za = self.get(public_key, user_id)
+        if za is None:
+            za = self._calculator.compute(public_key, user_id)
+            self._store([(user_id, public_key, za)])
+        return za
+
+    def bulk_add(self, users: Iterable[Tuple[bytes, Tuple[int, int]]], batch_size: int = 4096) -> int:
+        """批量注册 [(user_id, 公钥)]，按批计算ZA并一次写盘，返回新增记录数"""
+        added = 0
+        batch = []
+        for user_id, public_key in users:
+            if (public_key, user_id) not in self:
+                batch.append((user_id, public_key))
+            if len(batch) >= batch_size:
+                added += self._add_batch(batch)
+                batch = []
+        if batch:
+            added += self._add_batch(batch)
+        return added
+
+    def _add_batch(self, batch: list) -> int:
+        # 批内可能有重复用户，去重后再计算
+        unique = list(dict.fromkeys((bytes(user_id), public_key) for user_id, public_key in batch))
+        zas = self._calculator.compute_many(unique)
+        return self._store([(user_id, public_key, za) for (user_id, public_key), za in zip(unique, zas)])
+
+    def _store(self, records: list) -> int:
+        chunks = []
+        added = 0
+        with self._lock:
+            for user_id, public_key, za in records:
+                key = self._key(public_key, user_id)
+                if key in self._entries:
+                    continue
+                self._entries[key] = za
+                chunks.append(len(user_id).to_bytes(2, 'big') + key + za)
+                added += 1
+            if chunks and self.path is not None:
+                self._append_file().write(b"".join(chunks))
+                self._file.flush()
+        return added
+
+    def _append_file(self) -> BinaryIO:
+        if self._file is None:
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            if not new_file and self._valid_size is not None:
+                os.truncate(self.path, self._valid_size)
+            self._file = open(self.path, "ab")
+            if new_file:
+                self._file.write(self._header())
+        return self._file
+
+    def _header(self) -> bytes:
+        return REGISTRY_HEADER.pack(REGISTRY_MAGIC, REGISTRY_VERSION, self.curve.fingerprint())
+
+    def load(self, path: str) -> int:
+        """通过内存映射加载注册表文件，返回加载的记录数；末尾不完整的记录（写入中断）被忽略"""
+        point_size = 2 * self.curve.coord_size
+        loaded = 0
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < REGISTRY_HEADER.size:
+                raise ValueError("ZA注册表文件不完整")
+            magic, version, fingerprint = REGISTRY_HEADER.unpack_from(mm)
+            if magic != REGISTRY_MAGIC or version != REGISTRY_VERSION:
+                raise ValueError("ZA注册表文件格式或版本不匹配")
+            if fingerprint != self.curve.fingerprint():
+                raise ValueError("ZA注册表与当前曲线参数不匹配")
+
+            entries = self._entries
+            offset = REGISTRY_HEADER.size
+            end = len(mm)
+            while offset + 2 <= end:
+                key_end = offset + 2 + int.from_bytes(mm[offset:offset + 2], 'big') + point_size
+                if key_end + ZA_SIZE > end:
+                    break
+                entries[mm[offset + 2:key_end]] = mm[key_end:key_end + ZA_SIZE]
+                offset = key_end + ZA_SIZE
+                loaded += 1
+        if path == self.path:
+            self._valid_size = offset
+        return loaded
+
+    def save(self, path: Optional[str] = None) -> None:
+        """将全部记录紧凑地重写到文件（先写临时文件再原子替换）"""
+        path = path or self.path
+        if path is None:
+            raise ValueError("未指定注册表文件路径")
+        point_size = 2 * self.curve.coord_size
+        with self._lock:
+            if path == self.path:
+                self.close()
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self._header())
+                for key, za in self._entries.items():
+                    f.write((len(key) - point_size).to_bytes(2, 'big') + key + za)
+            os.replace(tmp_path, path)
+            if path == self.path:
+                self._valid_size = None
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "ZARegistry":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
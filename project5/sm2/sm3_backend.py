@@ -0,0 +1,229 @@
+import hashlib
+import struct
+from typing import Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # NumPy为可选依赖，缺失时批量接口退化为逐条计算
+    np = None
+
+# SM3初始向量与常量（GB/T 32905-2016）
+SM3_IV = (0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
+          0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E)
+SM3_T = [0x79CC4519] * 16 + [0x7A879D8A] * 48
+SM3_BLOCK_SIZE = 64
+SM3_DIGEST_SIZE = 32
+
+MASK32 = 0xFFFFFFFF
+
+
+def _rotl(x: int, n: int) -> int:
+    n %= 32
+    return ((x << n) | (x >> (32 - n))) & MASK32
+
+
+# 每轮使用的 T_j <<< (j mod 32)
+SM3_T_ROTATED = [_rotl(SM3_T[j], j) for j in range(64)]
+
+
+def _compress(v: tuple, block: bytes) -> tuple:
+    """SM3压缩函数 CF(V, B)"""
+    w = list(struct.unpack(">16I", block))
+    for j in range(16, 68):
+        x = w[j - 16] ^ w[j - 9] ^ _rotl(w[j - 3], 15)
+        x ^= _rotl(x, 15) ^ _rotl(x, 23)  # P1
+        w.append(x ^ _rotl(w[j - 13], 7) ^ w[j - 6])
+    w1 = [w[j] ^ w[j + 4] for j in range(64)]
+
+    a, b, c, d, e, f, g, h = v
+    for j in range(64):
+        a12 = _rotl(a, 12)
+        ss1 = _rotl((a12 + e + SM3_T_ROTATED[j]) & MASK32, 7)
+        ss2 = ss1 ^ a12
+        if j < 16:
+            ff = a ^ b ^ c
+            gg = e ^ f ^ g
+        else:
+            ff = (a & b) | (a & c) | (b & c)
+            gg = (e & f) | (~e & g)
+        tt1 = (ff + d + ss2 + w1[j]) & MASK32
+        tt2 = (gg + h + ss1 + w[j]) & MASK32
+        d = c
+        c = _rotl(b, 9)
+        b = a
+        a = tt1
+        h = g
+        g = _rotl(f, 19)
+        f = e
+        e = tt2 ^ _rotl(tt2, 9) ^ _rotl(tt2, 17)  # P0
+
+    return tuple(x ^ y for x, y in zip(v, (a, b, c, d, e, f, g, h)))
+
+
+def _pad(length: int) -> bytes:
+    """消息填充：0x80 | 0x00... | 64位大端比特长度"""
+    padding = b"\x80" + b"\x00" * ((55 - length) % SM3_BLOCK_SIZE)
+    return padding + (length * 8).to_bytes(8, 'big')
+
+
+class SM3:
+    """SM3哈希算法的纯Python参考实现，接口与 hashlib 对象一致"""
+
+    name = "sm3"
+    digest_size = SM3_DIGEST_SIZE
+    block_size = SM3_BLOCK_SIZE
+
+    def __init__(self, data: bytes = b""):
+        self._v = SM3_IV
+        self._buffer = b""
+        self._length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data: bytes) -> None:
+        data = bytes(data)
+        self._length += len(data)
+        data = self._buffer + data
+        full = len(data) - len(data) % SM3_BLOCK_SIZE
+        v = self._v
+        for i in range(0, full, SM3_BLOCK_SIZE):
+            v = _compress(v, data[i:i + SM3_BLOCK_SIZE])
+        self._v = v
+        self._buffer = data[full:]
+
+    def copy(self) -> "SM3":
+        clone = SM3.__new__(SM3)
+        clone._v, clone._buffer, clone._length = self._v, self._buffer, self._length
+        return clone
+
+    def digest(self) -> bytes:
+        tail = self._buffer + _pad(self._length)
+        v = self._v
+        for i in range(0, len(tail), SM3_BLOCK_SIZE):
+            v = _compress(v, tail[i:i + SM3_BLOCK_SIZE])
+        return struct.pack(">8I", *v)
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+
+# ------------------------------
+# 后端选择
+# ------------------------------
+
+BACKENDS = ("hashlib", "python")
+_backend = "hashlib" if "sm3" in hashlib.algorithms_available else "python"
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def set_backend(name: str) -> None:
+    """选择SM3后端: "hashlib"（OpenSSL提供的C实现）或 "python"（纯Python参考实现）"""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"未知的SM3后端: {name}")
+    if name == "hashlib" and "sm3" not in hashlib.algorithms_available:
+        raise ValueError("当前OpenSSL不支持SM3")
+    _backend = name
+
+
+def new(data: bytes = b""):
+    """创建SM3哈希对象（支持 update / copy / digest）"""
+    if _backend == "hashlib":
+        return hashlib.new("sm3", data)
+    return SM3(data)
+
+
+def sm3_hash(data: bytes) -> bytes:
+    """计算SM3摘要（32字节）"""
+    if _backend == "hashlib":
+        return hashlib.new("sm3", data).digest()
+    return SM3(data).digest()
+
+
+# ------------------------------
+# NumPy多缓冲批量实现
+# ------------------------------
+
+def _np_rotl(x, n: int):
+    n %= 32
+    if n == 0:
+        return x
+    return (x << np.uint32(n)) | (x >> np.uint32(32 - n))
+
+
+def _sm3_hash_equal_length(messages: List[bytes]) -> List[bytes]:
+    """对等长消息做多缓冲SM3：每条消息占一个uint32通道，所有通道同步压缩"""
+    lanes = len(messages)
+    padded = b"".join(m + _pad(len(messages[0])) for m in messages)
+    words = np.frombuffer(padded, dtype=">u4").astype(np.uint32).reshape(lanes, -1, 16)
+
+    v = [np.full(lanes, iv, dtype=np.uint32) for iv in SM3_IV]
+    t_rotated = [np.uint32(t) for t in SM3_T_ROTATED]
+
+    for block in range(words.shape[1]):
+        w = [words[:, block, j] for j in range(16)]
+        for j in range(16, 68):
+            x = w[j - 16] ^ w[j - 9] ^ _np_rotl(w[j - 3], 15)
+            x = x ^ _np_rotl(x, 15) ^ _np_rotl(x, 23)
+            w.append(x ^ _np_rotl(w[j - 13], 7) ^ w[j - 6])
+
+        a, b, c, d, e, f, g, h = v
+        for j in range(64):
+            a12 = _np_rotl(a, 12)
+            ss1 = _np_rotl(a12 + e + t_rotated[j], 7)
+            ss2 = ss1 ^ a12
+            if j < 16:
+                ff = a ^ b ^ c
+                gg = e ^ f ^ g
+            else:
+                ff = (a & b) | (a & c) | (b & c)
+                gg = (e & f) | (~e & g)
+            tt1 = ff + d + ss2 + (w[j] ^ w[j + 4])
+            tt2 = gg + h + ss1 + w[j]
+            d = c
+            c = _np_rotl(b, 9)
+            b = a
+            a = tt1
+            h = g
+            g = _np_rotl(f, 19)
+            f = e
+            e = tt2 ^ _np_rotl(tt2, 9) ^ _np_rotl(tt2, 17)
+        v = [x ^ y for x, y in zip(v, (a, b, c, d, e, f, g, h))]
+
+    digests = np.stack(v, axis=1).astype(">u4").tobytes()
+    return [digests[i * SM3_DIGEST_SIZE:(i + 1) * SM3_DIGEST_SIZE] for i in range(lanes)]
+
+
+def sm3_hash_batch(messages: List[bytes], min_lanes: int = 8) -> List[bytes]:
+    """批量计算SM3摘要，结果与输入顺序一致
+
+    使用纯Python后端且安装了NumPy时，按长度分组，组内消息数不少于 min_lanes 的
+    用多缓冲方式一次计算；其余（以及hashlib后端）逐条计算。
+    """
+    if _backend == "hashlib" or np is None:
+        return [sm3_hash(m) for m in messages]
+
+    groups: Dict[int, List[int]] = {}
+    for i, m in enumerate(messages):
+        groups.setdefault(len(m), []).append(i)
+
+    digests: List[bytes] = [b""] * len(messages)
+    for indices in groups.values():
+        if len(indices) >= min_lanes:
+            results = _sm3_hash_equal_length([bytes(messages[i]) for i in indices])
+        else:
+            results = [sm3_hash(messages[i]) for i in indices]
+        for i, digest in zip(indices, results):
+            digests[i] = digest
+    return digests
+
+
+if __name__ == "__main__":
+    # GB/T 32905-2016 附录A 示例
+    assert SM3(b"abc").hexdigest() == "66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0"
+    assert SM3(b"abcd" * 16).hexdigest() == "debe9ff92275b8a138604889c18e5a4d6fdb70e5387e5765293dcba39c0c5732"
+    print(f"当前SM3后端: {get_backend()}")
+    print(f"SM3('abc') = {sm3_hash(b'abc').hex()}")
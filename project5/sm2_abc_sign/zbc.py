@@ -1,26 +1,32 @@
+import os
+import sys
 import secrets
 import binascii
-from gmssl import sm3, func
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sm2"))
+from sm2_curve import SM2_TEST_CURVE
+from sm2_memo import memoize
+from sm2_optimized import OptimizedSM2
+from sm3_backend import sm3_hash
 
 # SM2椭圆曲线参数，与比特币不同
-ELLIPTIC_CURVE_A = 0x787968B4FA32C3FD2417842E73BBFEFF2F3C848B6831D7E0EC65228B3937E498
-ELLIPTIC_CURVE_B = 0x63E4C6D3B23B0C849CF84241484BFE48F61D59A5B16BA06E6E12D1DA27C5249A
-PRIME_MODULUS = 0x8542D69E4C044F18E8B92435BF6FF7DE457283915C45517D722EDB8B08F1DFC3
-ORDER_N = 0x8542D69E4C044F18E8B92435BF6FF7DD297720630485628D5AE74EE7C32E79B7
-BASE_POINT_X = 0x421DEBD61B62EAB6746434EBC3CC315E32220B3BADD50BDC4C4E6C147FEDD43D
-BASE_POINT_Y = 0x0680512BCBB42C07D47349D2153B70C4E5D7FDFCBFA36EA1A85841B9E46E09A2
+ELLIPTIC_CURVE_A = SM2_TEST_CURVE.a
+ELLIPTIC_CURVE_B = SM2_TEST_CURVE.b
+PRIME_MODULUS = SM2_TEST_CURVE.p
+ORDER_N = SM2_TEST_CURVE.n
+BASE_POINT_X = SM2_TEST_CURVE.gx
+BASE_POINT_Y = SM2_TEST_CURVE.gy
 BASE_POINT = (BASE_POINT_X, BASE_POINT_Y)
 
-# 缓存字典，用于加速计算
-MODULAR_INVERSE_CACHE = {}
-POINT_ADDITION_CACHE = {}
+# 共享的优化曲线引擎（持有该曲线自己的基点预计算表）
+CURVE_ENGINE = OptimizedSM2(curve=SM2_TEST_CURVE)
 
+# 有界记忆化缓存（统计与开关见 sm2_memo.cache_stats / configure_cache）：
+# 模逆缓存默认开启（同一私钥的 (1+d)^-1 等会重复出现）；
+# 点加对随机标量几乎不会命中，默认关闭
+@memoize("zbc.modular_inverse", capacity=1024)
 def modular_inverse(value, modulus):
     """计算模逆元，是椭圆曲线运算的基础"""
-    cache_key = (value, modulus)
-    if cache_key in MODULAR_INVERSE_CACHE:
-        return MODULAR_INVERSE_CACHE[cache_key]
-    
     if value == 0: return 0
     lm, hm = 1, 0
     low, high = value % modulus, modulus
@@ -28,15 +34,11 @@ def modular_inverse(value, modulus):
         ratio = high // low
         next_m, next_h = hm - lm * ratio, high - low * ratio
         lm, low, hm, high = next_m, next_h, lm, low
-    result = lm % modulus
-    MODULAR_INVERSE_CACHE[cache_key] = result
-    return result
+    return lm % modulus
 
+@memoize("zbc.sm2_point_addition", capacity=4096, enabled=False)
 def sm2_point_addition(pt1, pt2):
     """SM2椭圆曲线上的点加法"""
-    cache_key = (pt1, pt2)
-    if cache_key in POINT_ADDITION_CACHE:
-        return POINT_ADDITION_CACHE[cache_key]
     if pt1 == (0, 0): return pt2
     if pt2 == (0, 0): return pt1
     x1, y1 = pt1
@@ -51,36 +53,23 @@ def sm2_point_addition(pt1, pt2):
     slope %= PRIME_MODULUS
     x3 = (slope * slope - x1 - x2) % PRIME_MODULUS
     y3 = (slope * (x1 - x3) - y1) % PRIME_MODULUS
-    result = (x3, y3)
-    POINT_ADDITION_CACHE[cache_key] = result
-    return result
+    return (x3, y3)
+
+# 兼容旧名称：原模块级字典替换为有界缓存对象
+MODULAR_INVERSE_CACHE = modular_inverse.cache
+POINT_ADDITION_CACHE = sm2_point_addition.cache
 
 def sm2_scalar_multiplication(scalar, point):
-    """SM2椭圆曲线上的标量乘法"""
-    result = (0, 0)
-    current_point = point
-    while scalar:
-        if scalar & 1:
-            result = sm2_point_addition(result, current_point)
-        current_point = sm2_point_addition(current_point, current_point)
-        scalar >>= 1
-    return result
+    """SM2椭圆曲线上的标量乘法（委托给共享曲线引擎：基点查表，其他点滑动窗口）"""
+    scalar %= ORDER_N
+    if scalar == 0 or point == (0, 0):
+        return (0, 0)
+    result = CURVE_ENGINE.point_multiply_windowed(scalar, point)
+    return (0, 0) if result is None else result
 
 def compute_user_hash(user_id, public_key_x, public_key_y):
-    """计算用户标识哈希值 (ZA)"""
-    id_bitlen = len(user_id.encode('utf-8')) * 8
-    components = [
-        id_bitlen.to_bytes(2, 'big'),
-        user_id.encode('utf-8'),
-        ELLIPTIC_CURVE_A.to_bytes(32, 'big'),
-        ELLIPTIC_CURVE_B.to_bytes(32, 'big'),
-        BASE_POINT_X.to_bytes(32, 'big'),
-        BASE_POINT_Y.to_bytes(32, 'big'),
-        public_key_x.to_bytes(32, 'big'),
-        public_key_y.to_bytes(32, 'big')
-    ]
-    data_to_hash = b''.join(components)
-    return sm3.sm3_hash(func.bytes_to_list(data_to_hash))
+    """计算用户标识哈希值 (ZA)，返回32字节摘要（曲线参数前缀的SM3状态由共享引擎缓存）"""
+    return CURVE_ENGINE.za_calculator.compute((public_key_x, public_key_y), user_id.encode('utf-8'))
 
 def generate_keypair():
     """生成SM2密钥对"""
@@ -90,10 +79,9 @@ def generate_keypair():
 
 def sign_with_sm2(private_key, message, user_id, public_key):
     """使用SM2私钥对消息进行签名"""
-    za_bytes = bytes.fromhex(compute_user_hash(user_id, public_key[0], public_key[1]))
+    za_bytes = compute_user_hash(user_id, public_key[0], public_key[1])
     data_for_hash = za_bytes + message.encode('utf-8')
-    hash_result = sm3.sm3_hash(func.bytes_to_list(data_for_hash))
-    e_val = int(hash_result, 16)
+    e_val = int.from_bytes(sm3_hash(data_for_hash), 'big')
 
     while True:
         k_val = secrets.randbelow(ORDER_N - 1) + 1
@@ -114,10 +102,9 @@ def verify_sm2_signature(public_key, message, user_id, signature):
     if not (0 < r_val < ORDER_N and 0 < s_val < ORDER_N):
         return False
     
-    za_bytes = bytes.fromhex(compute_user_hash(user_id, public_key[0], public_key[1]))
+    za_bytes = compute_user_hash(user_id, public_key[0], public_key[1])
     data_for_hash = za_bytes + message.encode('utf-8')
-    hash_result = sm3.sm3_hash(func.bytes_to_list(data_for_hash))
-    e_val = int(hash_result, 16)
+    e_val = int.from_bytes(sm3_hash(data_for_hash), 'big')
     
     t = (r_val + s_val) % ORDER_N
     if t == 0:
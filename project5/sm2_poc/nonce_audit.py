@@ -0,0 +1,499 @@
+import argparse
+import json
+import os
+import secrets
+import shutil
+import struct
+import sys
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sm2"))
+from sm2_curve import CURVES, CurveParams, SM2_RECOMMENDED, SM2_TEST_CURVE
+from sm2_ecdsa import ECDSAEngine
+from sm2_memo import LRUCache
+from sm2_optimized import OptimizedSM2
+from sm3_backend import sm3_hash
+
+ALG_SM2 = 0
+ALG_ECDSA = 1
+ALG_NAMES = {"sm2": ALG_SM2, "ecdsa": ALG_ECDSA}
+HAS_LEAKED_K = 0x80
+
+DEFAULT_USER_ID = b"1234567812345678"
+
+# 溢出分区中的定长行: 标志(算法|是否含泄露的k) | 记录序号 | 公钥x | 公钥y | r | s | e | k
+SPILL_ROW = struct.Struct(">BQ32s32s32s32s32s32s")
+
+# 二进制签名语料格式: 魔数，随后每条记录为
+# 算法(1B) | user_id长度(2B) | user_id | 公钥SEC1编码(33或65B) | r(32B) | s(32B) | 消息长度(4B) | 消息
+BINARY_MAGIC = b"SM2SIGS\x00"
+
+
+class SignatureRow(NamedTuple):
+    """一条签名在审计中使用的全部信息（e 已由消息算出）"""
+    index: int
+    alg: int
+    public_key: Tuple[int, int]
+    r: int
+    s: int
+    e: int
+    k: Optional[int]
+
+
+def _parse_int(value) -> int:
+    if isinstance(value, int):
+        return value
+    return int(value, 16)
+
+
+def _encode_row(row: SignatureRow) -> bytes:
+    flags = row.alg | (HAS_LEAKED_K if row.k is not None else 0)
+    x, y = row.public_key
+    return SPILL_ROW.pack(flags, row.index, *(v.to_bytes(32, 'big') for v in (x, y, row.r, row.s, row.e, row.k or 0)))
+
+
+def _decode_row(data: bytes) -> SignatureRow:
+    flags, index, *fields = SPILL_ROW.unpack(data)
+    x, y, r, s, e, k = (int.from_bytes(v, 'big') for v in fields)
+    return SignatureRow(index, flags & ~HAS_LEAKED_K, (x, y), r, s, e, k if flags & HAS_LEAKED_K else None)
+
+
+def _nonce_x(row: SignatureRow, n: int) -> int:
+    """签名随机点 R = kG 的x坐标（模n）：SM2 中 x1 = r - e，ECDSA 中 x1 = r"""
+    if row.alg == ALG_SM2:
+        return (row.r - row.e) % n
+    return row.r % n
+
+
+def _linear_nonce(row: SignatureRow, n: int) -> Tuple[int, int]:
+    """将签名方程改写为 k = alpha + beta * d (mod n)
+
+    SM2: s = (1+d)^-1 (k - r d)  =>  k = s + (s + r) d
+    ECDSA: s = k^-1 (e + r d)    =>  k = e/s + (r/s) d
+    """
+    if row.alg == ALG_SM2:
+        return row.s, (row.s + row.r) % n
+    s_inv = pow(row.s, -1, n)
+    return row.e * s_inv % n, row.r * s_inv % n
+
+
+# ------------------------------
+# 语料读写
+# ------------------------------
+
+def read_jsonl(path: str) -> Iterator[dict]:
+    """逐行读取JSONL签名语料
+
+    字段: alg ("sm2"/"ecdsa"，默认sm2), public_key (SEC1十六进制), user_id (字符串),
+    message (UTF-8字符串) 或 message_hex, r, s (十六进制)；可选 e (预先计算的摘要)、k (已泄露的随机数)。
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def write_binary(path: str, records: Iterable[dict]) -> None:
+    """写出二进制签名语料（字段同 read_binary 的输出）"""
+    with open(path, "wb") as f:
+        f.write(BINARY_MAGIC)
+        for record in records:
+            user_id = record.get("user_id", DEFAULT_USER_ID)
+            f.write(bytes([ALG_NAMES[record.get("alg", "sm2")]]))
+            f.write(len(user_id).to_bytes(2, 'big') + user_id)
+            f.write(record["public_key"])
+            f.write(record["r"].to_bytes(32, 'big') + record["s"].to_bytes(32, 'big'))
+            f.write(len(record["message"]).to_bytes(4, 'big') + record["message"])
+
+
+def read_binary(path: str) -> Iterator[dict]:
+    """流式读取二进制签名语料"""
+    names = {v: k for k, v in ALG_NAMES.items()}
+    with open(path, "rb") as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError("二进制语料格式不正确")
+        while True:
+            head = f.read(3)
+            if not head:
+                return
+            if len(head) != 3 or head[0] not in names:
+                raise ValueError("二进制语料记录损坏")
+            user_id = f.read(int.from_bytes(head[1:3], 'big'))
+            prefix = f.read(1)
+            public_key = prefix + f.read(64 if prefix == b"\x04" else 32)
+            r = int.from_bytes(f.read(32), 'big')
+            s = int.from_bytes(f.read(32), 'big')
+            message = f.read(int.from_bytes(f.read(4), 'big'))
+            yield {"alg": names[head[0]], "user_id": user_id, "public_key": public_key,
+                   "r": r, "s": s, "message": message}
+
+
+# ------------------------------
+# 分区扫描与私钥验证（在工作进程中执行）
+# ------------------------------
+
+def _scan_partition(path: str, n: int) -> List[List[bytes]]:
+    """读取一个分区，返回随机点x坐标相同（即共享随机数k）的签名组"""
+    index: Dict[int, List[bytes]] = {}
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(SPILL_ROW.size)
+            if not data:
+                break
+            index.setdefault(_nonce_x(_decode_row(data), n), []).append(data)
+
+    groups = []
+    for rows in index.values():
+        if len(rows) < 2:
+            continue
+        # 同一签名重复出现不算随机数重用
+        distinct = {}
+        for data in rows:
+            row = _decode_row(data)
+            distinct.setdefault((row.alg, row.public_key, row.r, row.s), data)
+        if len(distinct) > 1:
+            groups.append(list(distinct.values()))
+    return groups
+
+
+_verifier: Optional[OptimizedSM2] = None
+
+
+def _init_verifier(curve: CurveParams) -> None:
+    global _verifier
+    _verifier = OptimizedSM2(curve=curve, pubkey_cache_size=0, point_cache_size=0)
+
+
+def _verify_candidates(chunk: List[Tuple[Tuple[int, int], int]]) -> List[bool]:
+    """检查候选私钥: d*G 是否等于公钥"""
+    return [0 < d < _verifier.N and _verifier.point_multiply_precomputed(d) == public_key
+            for public_key, d in chunk]
+
+
+# ------------------------------
+# 审计器
+# ------------------------------
+
+class NonceAuditor:
+    """签名随机数重用审计
+
+    1. 流式读入签名，计算 e 与随机点x坐标 x1，按 x1 哈希分区写入磁盘（内存占用与语料规模无关）；
+    2. 各分区在进程池中独立建立 x1 索引，找出共享k的签名组；
+    3. 同一公钥的两条签名（SM2/SM2、SM2/ECDSA、ECDSA/ECDSA）直接解出私钥，
+       已知私钥或已泄露的k再沿签名组传播到共享同一k的其他公钥，迭代至不再有新私钥；
+       每个候选私钥都在进程池中用 d*G 校验后才被接受。
+    """
+
+    def __init__(self, curve: CurveParams = SM2_RECOMMENDED, workers: Optional[int] = None,
+                 partitions: int = 64, spill_dir: Optional[str] = None, za_cache_size: int = 65536,
+                 known_keys: Optional[Dict[Tuple[int, int], int]] = None):
+        self.curve = curve
+        self.engine = OptimizedSM2(curve=curve, pubkey_cache_size=0)
+        self.ecdsa = ECDSAEngine(sm2=self.engine, pubkey_cache_size=0)
+        self.workers = workers or os.cpu_count() or 1
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.known_keys = dict(known_keys or {})
+        self._za_cache = LRUCache(za_cache_size)
+        self._executor: Optional[Executor] = None
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_verifier,
+                                                 initargs=(self.curve,))
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> "NonceAuditor":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _map(self, func, items: list, *args) -> list:
+        if self.workers <= 1 or len(items) <= 1:
+            # 进程内的校验器可能由其他曲线的审计器创建过
+            if func is _verify_candidates and (_verifier is None or _verifier.curve != self.curve):
+                _init_verifier(self.curve)
+            return [func(item, *args) for item in items]
+        return list(self._pool().map(func, items, *(repeat(arg) for arg in args)))
+
+    def _to_row(self, index: int, record: dict) -> SignatureRow:
+        alg = record.get("alg", "sm2")
+        if alg not in ALG_NAMES:
+            raise ValueError(f"未知的签名算法: {alg}")
+        public_key = record["public_key"]
+        if isinstance(public_key, str):
+            public_key = bytes.fromhex(public_key)
+        public_key = self.engine.decode_point(public_key)
+
+        message = record.get("message")
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        elif message is None and "message_hex" in record:
+            message = bytes.fromhex(record["message_hex"])
+
+        n = self.curve.n
+        if "e" in record:
+            e = _parse_int(record["e"])
+        elif ALG_NAMES[alg] == ALG_SM2:
+            user_id = record.get("user_id", DEFAULT_USER_ID)
+            if isinstance(user_id, str):
+                user_id = user_id.encode("utf-8")
+            key = (public_key, user_id)
+            za = self._za_cache.get(key)
+            if za is None:
+                za = self.engine._compute_za_from_pubkey(public_key, user_id)
+                self._za_cache.put(key, za)
+            e = int.from_bytes(sm3_hash(za + message), 'big')
+        else:
+            e = self.ecdsa.hash_to_int(message)
+
+        r = _parse_int(record["r"]) % n
+        s = _parse_int(record["s"]) % n
+        if r == 0 or s == 0:
+            # 合法签名的 r, s 都在 [1, n-1] 内；ECDSA 的 s≡0 时 _linear_nonce 无法求 s^-1
+            raise ValueError("签名值 r 或 s 为0")
+        k = _parse_int(record["k"]) if record.get("k") is not None else None
+        return SignatureRow(index, ALG_NAMES[alg], public_key, r, s, e % n, k)
+
+    def _spill(self, records: Iterable[dict], directory: str) -> Tuple[int, int, List[str], List[SignatureRow]]:
+        """按 x1 分区写出所有签名，返回 (记录数, 跳过的格式错误记录数, 分区文件, 含泄露k的签名)
+
+        公钥无法解码或不在曲线上、字段缺失或无法解析、r 或 s 为0的记录被跳过并计数。
+        """
+        n = self.curve.n
+        paths = [os.path.join(directory, f"part-{i:04d}.bin") for i in range(self.partitions)]
+        files = [open(path, "wb") for path in paths]
+        leaked = []
+        count = 0
+        skipped = 0
+        try:
+            for index, record in enumerate(records):
+                try:
+                    row = self._to_row(index, record)
+                except (ValueError, KeyError, TypeError):
+                    skipped += 1
+                    continue
+                files[_nonce_x(row, n) % self.partitions].write(_encode_row(row))
+                if row.k is not None:
+                    leaked.append(row)
+                count += 1
+        finally:
+            for f in files:
+                f.close()
+        return count, skipped, paths, leaked
+
+    def _verify(self, candidates: List[Tuple[Tuple[int, int], int]]) -> List[bool]:
+        chunk_size = max(1, len(candidates) // (self.workers * 4) + 1)
+        chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+        results = []
+        for chunk_result in self._map(_verify_candidates, chunks):
+            results.extend(chunk_result)
+        return results
+
+    def recover(self, groups: List[List[SignatureRow]]) -> Dict[Tuple[int, int], dict]:
+        """在共享k的签名组上迭代恢复私钥"""
+        n = self.curve.n
+        known: Dict[Tuple[int, int], int] = dict(self.known_keys)
+        recovered: Dict[Tuple[int, int], dict] = {}
+        groups_of_key: Dict[Tuple[int, int], Set[int]] = {}
+        for gid, group in enumerate(groups):
+            for row in group:
+                groups_of_key.setdefault(row.public_key, set()).add(gid)
+
+        # 候选: 公钥 -> [(d, 方法, 涉及的记录序号)]
+        candidates: Dict[Tuple[int, int], List[Tuple[int, str, Tuple[int, ...]]]] = {}
+
+        def propose(public_key, numerator, denominator, method, indices):
+            if public_key in known or denominator % n == 0:
+                return
+            d = numerator * pow(denominator, -1, n) % n
+            candidates.setdefault(public_key, []).append((d, method, indices))
+
+        # 第一轮: 泄露的k与同一公钥内的k重用（k' = ±k，R与-R的x坐标相同）
+        for group in groups:
+            by_key: Dict[Tuple[int, int], List[SignatureRow]] = {}
+            for row in group:
+                alpha, beta = _linear_nonce(row, n)
+                if row.k is not None:
+                    propose(row.public_key, row.k - alpha, beta, "leaked_k", (row.index,))
+                by_key.setdefault(row.public_key, []).append(row)
+            for public_key, rows in by_key.items():
+                for first, second in zip(rows, rows[1:]):
+                    a1, b1 = _linear_nonce(first, n)
+                    a2, b2 = _linear_nonce(second, n)
+                    method = "same_key" if first.alg == second.alg else "cross_algorithm"
+                    for sign in (1, -1):
+                        propose(public_key, sign * a2 - a1, b1 - sign * b2, method, (first.index, second.index))
+
+        pending_groups = set(range(len(groups))) if known else set()
+        while True:
+            # 已知私钥 -> 组内的k -> 组内其他公钥的私钥
+            for gid in pending_groups:
+                group = groups[gid]
+                source = next((row for row in group if row.public_key in known), None)
+                if source is None:
+                    continue
+                alpha, beta = _linear_nonce(source, n)
+                k = (alpha + beta * known[source.public_key]) % n
+                for row in group:
+                    a, b = _linear_nonce(row, n)
+                    for sign in (1, -1):
+                        propose(row.public_key, sign * k - a, b, "shared_k", (source.index, row.index))
+
+            if not candidates:
+                break
+            flat = [(public_key, d) for public_key, items in candidates.items() for d, _, _ in items]
+            results = iter(self._verify(flat))
+            newly_known = []
+            for public_key, items in candidates.items():
+                for d, method, indices in items:
+                    if next(results) and public_key not in known:
+                        known[public_key] = d
+                        recovered[public_key] = {"private_key": d, "method": method, "records": list(indices)}
+                        newly_known.append(public_key)
+            candidates.clear()
+            pending_groups = set()
+            for public_key in newly_known:
+                pending_groups |= groups_of_key.get(public_key, set())
+            if not pending_groups:
+                break
+        return recovered
+
+    def audit(self, records: Iterable[dict]) -> dict:
+        """审计签名语料，返回统计信息、共享k的签名组与恢复出的私钥"""
+        directory = tempfile.mkdtemp(prefix="sm2-nonce-audit-", dir=self.spill_dir)
+        try:
+            count, skipped, paths, leaked = self._spill(records, directory)
+            groups = []
+            for partition_groups in self._map(_scan_partition, paths, self.curve.n):
+                groups.extend([_decode_row(data) for data in group] for group in partition_groups)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        # 泄露k的签名即使没有与其他签名共享k也能直接恢复私钥
+        grouped = {row.index for group in groups for row in group}
+        all_groups = groups + [[row] for row in leaked if row.index not in grouped]
+        recovered = self.recover(all_groups)
+
+        return {
+            "curve": self.curve.name,
+            "records": count,
+            "skipped_records": skipped,
+            "partitions": self.partitions,
+            "reused_nonce_groups": [sorted(row.index for row in group) for group in groups],
+            "recovered_keys": [
+                {"public_key": self.engine.encode_point(public_key, compressed=False).hex(),
+                 "private_key": f"{info['private_key']:064x}", "method": info["method"],
+                 "records": info["records"]}
+                for public_key, info in recovered.items()
+            ],
+        }
+
+
+# ------------------------------
+# 演示语料
+# ------------------------------
+
+def _sm2_sign_with_nonce(engine: OptimizedSM2, d: int, public_key: Tuple[int, int],
+                         message: bytes, k: int, user_id: bytes = DEFAULT_USER_ID) -> Tuple[int, int]:
+    n = engine.N
+    x1 = engine.point_multiply_precomputed(k)[0]
+    e = int.from_bytes(sm3_hash(engine._compute_za_from_pubkey(public_key, user_id) + message), 'big')
+    r = (e + x1) % n
+    return r, pow(1 + d, -1, n) * (k - r * d) % n
+
+
+def write_demo_corpus(path: str, count: int = 1000, curve: CurveParams = SM2_TEST_CURVE) -> Dict[str, int]:
+    """生成演示语料（JSONL）：正常签名中混入 sm2_poc.py 中的四种随机数误用场景"""
+    engine = OptimizedSM2(curve=curve)
+    ecdsa = ECDSAEngine(sm2=engine)
+    n = engine.N
+    keys = [engine.generate_keypair_secure() for _ in range(6)]
+
+    def record(alg, key, message, k, user_id=DEFAULT_USER_ID, leaked=False):
+        d, public_key = key
+        if alg == "sm2":
+            r, s = _sm2_sign_with_nonce(engine, d, public_key, message, k, user_id)
+        else:
+            r, s = ecdsa.sign(message, d, k)
+        item = {"alg": alg, "public_key": engine.encode_point(public_key).hex(),
+                "user_id": user_id.decode(), "message": message.decode(), "r": f"{r:x}", "s": f"{s:x}"}
+        if leaked:
+            item["k"] = f"{k:x}"
+        return item
+
+    reused = [secrets.randbelow(n - 1) + 1 for _ in range(4)]
+    special = [
+        record("sm2", keys[0], b"leaked nonce", reused[0], leaked=True),          # 场景一: k泄露
+        record("sm2", keys[1], b"first message", reused[1]),                     # 场景二: 同一私钥重用k
+        record("sm2", keys[1], b"second message", reused[1]),
+        record("sm2", keys[0], b"from known key", reused[2]),                    # 场景三: 不同私钥共享k
+        record("sm2", keys[2], b"from victim", reused[2]),
+        record("ecdsa", keys[3], b"ecdsa message", reused[3]),                   # 场景四: SM2与ECDSA共享k
+        record("sm2", keys[3], b"sm2 message", reused[3]),
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps(record("sm2", keys[4 + i % 2], f"message {i}".encode(),
+                                      secrets.randbelow(n - 1) + 1)) + "\n")
+        for item in special:
+            f.write(json.dumps(item) + "\n")
+    return {f"key{i}": d for i, (d, _) in enumerate(keys)}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="SM2/ECDSA签名随机数重用审计")
+    parser.add_argument("input", nargs="?", help="签名语料（.jsonl 或二进制格式）")
+    parser.add_argument("--binary", action="store_true", help="输入为二进制格式")
+    parser.add_argument("--curve", default=SM2_RECOMMENDED.name, choices=sorted(CURVES))
+    parser.add_argument("--known-keys", help="已知私钥JSON文件 {公钥SEC1十六进制: 私钥十六进制}")
+    parser.add_argument("--workers", type=int, help="工作进程数（默认CPU核数）")
+    parser.add_argument("--partitions", type=int, default=64, help="磁盘溢出分区数")
+    parser.add_argument("--spill-dir", help="溢出分区所在目录")
+    parser.add_argument("--output", help="将审计报告写入JSON文件")
+    parser.add_argument("--demo", type=int, metavar="N", help="生成含N条正常签名的演示语料并审计（测试曲线）")
+    args = parser.parse_args(argv)
+
+    curve = CURVES[args.curve]
+    path = args.input
+    if args.demo is not None:
+        curve = SM2_TEST_CURVE
+        path = path or os.path.join(tempfile.gettempdir(), "sm2_nonce_demo.jsonl")
+        write_demo_corpus(path, args.demo, curve)
+        print(f"演示语料已写入 {path}")
+    if path is None:
+        parser.error("需要指定输入文件或 --demo")
+
+    engine = OptimizedSM2(curve=curve)
+    known_keys = {}
+    if args.known_keys:
+        with open(args.known_keys, encoding="utf-8") as f:
+            known_keys = {engine.decode_point(bytes.fromhex(pub)): int(d, 16) for pub, d in json.load(f).items()}
+
+    records = read_binary(path) if args.binary else read_jsonl(path)
+    with NonceAuditor(curve, args.workers, args.partitions, args.spill_dir, known_keys=known_keys) as auditor:
+        report = auditor.audit(records)
+
+    print(f"审计记录数: {report['records']}")
+    if report["skipped_records"]:
+        print(f"跳过的格式错误记录: {report['skipped_records']}")
+    print(f"共享随机数的签名组: {len(report['reused_nonce_groups'])}")
+    for item in report["recovered_keys"]:
+        print(f"恢复私钥 [{item['method']}] 记录 {item['records']}: {item['private_key']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
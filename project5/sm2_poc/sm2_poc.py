@@ -1,30 +1,38 @@
+import os
+import sys
 import secrets
 import binascii
 from hashlib import sha256
-from gmssl import sm3, func
 import time
 import functools
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sm2"))
+from sm2_curve import SM2_TEST_CURVE
+from sm2_ecdsa import ECDSAEngine
+from sm2_memo import memoize
+from sm2_optimized import OptimizedSM2
+from sm3_backend import sm3_hash
+
 # SM2椭圆曲线参数
-ELLIPTIC_CURVE_A = 0x787968B4FA32C3FD2417842E73BBFEFF2F3C848B6831D7E0EC65228B3937E498
-ELLIPTIC_CURVE_B = 0x63E4C6D3B23B0C849CF84241484BFE48F61D59A5B16BA06E6E12D1DA27C5249A
-PRIME_MODULUS = 0x8542D69E4C044F18E8B92435BF6FF7DE457283915C45517D722EDB8B08F1DFC3
-ORDER_N = 0x8542D69E4C044F18E8B92435BF6FF7DD297720630485628D5AE74EE7C32E79B7
-BASE_POINT_X = 0x421DEBD61B62EAB6746434EBC3CC315E32220B3BADD50BDC4C4E6C147FEDD43D
-BASE_POINT_Y = 0x0680512BCBB42C07D47349D2153B70C4E5D7FDFCBFA36EA1A85841B9E46E09A2
+ELLIPTIC_CURVE_A = SM2_TEST_CURVE.a
+ELLIPTIC_CURVE_B = SM2_TEST_CURVE.b
+PRIME_MODULUS = SM2_TEST_CURVE.p
+ORDER_N = SM2_TEST_CURVE.n
+BASE_POINT_X = SM2_TEST_CURVE.gx
+BASE_POINT_Y = SM2_TEST_CURVE.gy
 BASE_POINT = (BASE_POINT_X, BASE_POINT_Y)
-SM3_HASH_SIZE = 32
 
-# 缓存字典，用于加速计算
-MODULAR_INVERSE_CACHE = {}
-POINT_ADDITION_CACHE = {}
+# 共享的优化曲线引擎（持有该曲线自己的基点预计算表）
+CURVE_ENGINE = OptimizedSM2(curve=SM2_TEST_CURVE)
+ECDSA_ENGINE = ECDSAEngine(sm2=CURVE_ENGINE)
+SM3_HASH_SIZE = 32
 
+# 有界记忆化缓存（统计与开关见 sm2_memo.cache_stats / configure_cache）：
+# 模逆缓存默认开启（同一私钥的 (1+d)^-1 等会重复出现）；
+# 点加对随机标量几乎不会命中，默认关闭
+@memoize("sm2_poc.modular_inverse", capacity=1024)
 def modular_inverse(value, modulus):
     """使用扩展欧几里得算法计算模逆元"""
-    cache_key = (value, modulus)
-    if cache_key in MODULAR_INVERSE_CACHE:
-        return MODULAR_INVERSE_CACHE[cache_key]
-    
     if value == 0:
         return 0
 
@@ -35,16 +43,11 @@ def modular_inverse(value, modulus):
         next_m, next_h = hm - lm * ratio, high - low * ratio
         lm, low, hm, high = next_m, next_h, lm, low
 
-    result = lm % modulus
-    MODULAR_INVERSE_CACHE[cache_key] = result
-    return result
+    return lm % modulus
 
+@memoize("sm2_poc.sm2_point_addition", capacity=4096, enabled=False)
 def sm2_point_addition(pt1, pt2):
     """SM2椭圆曲线上的点加法"""
-    cache_key = (pt1, pt2)
-    if cache_key in POINT_ADDITION_CACHE:
-        return POINT_ADDITION_CACHE[cache_key]
-
     if pt1 == (0, 0): return pt2
     if pt2 == (0, 0): return pt1
 
@@ -65,38 +68,23 @@ def sm2_point_addition(pt1, pt2):
     x3 = (slope * slope - x1 - x2) % PRIME_MODULUS
     y3 = (slope * (x1 - x3) - y1) % PRIME_MODULUS
     
-    result = (x3, y3)
-    POINT_ADDITION_CACHE[cache_key] = result
-    return result
+    return (x3, y3)
+
+# 兼容旧名称：原模块级字典替换为有界缓存对象
+MODULAR_INVERSE_CACHE = modular_inverse.cache
+POINT_ADDITION_CACHE = sm2_point_addition.cache
 
 def sm2_scalar_multiplication(scalar, point):
-    """SM2椭圆曲线上的标量乘法，使用双加算法"""
-    result = (0, 0)
-    current_point = point
-    while scalar:
-        if scalar & 1:
-            result = sm2_point_addition(result, current_point)
-        current_point = sm2_point_addition(current_point, current_point)
-        scalar >>= 1
-    return result
+    """SM2椭圆曲线上的标量乘法（委托给共享曲线引擎：基点查表，其他点滑动窗口）"""
+    scalar %= ORDER_N
+    if scalar == 0 or point == (0, 0):
+        return (0, 0)
+    result = CURVE_ENGINE.point_multiply_windowed(scalar, point)
+    return (0, 0) if result is None else result
 
 def compute_user_hash(user_id, public_key_x, public_key_y):
-    """计算用户标识哈希值 (ZA)"""
-    id_bitlen = len(user_id.encode('utf-8')) * 8
-    
-    components = [
-        id_bitlen.to_bytes(2, 'big'),
-        user_id.encode('utf-8'),
-        ELLIPTIC_CURVE_A.to_bytes(32, 'big'),
-        ELLIPTIC_CURVE_B.to_bytes(32, 'big'),
-        BASE_POINT_X.to_bytes(32, 'big'),
-        BASE_POINT_Y.to_bytes(32, 'big'),
-        public_key_x.to_bytes(32, 'big'),
-        public_key_y.to_bytes(32, 'big')
-    ]
-    data_to_hash = b''.join(components)
-    
-    return sm3.sm3_hash(func.bytes_to_list(data_to_hash))
+    """计算用户标识哈希值 (ZA)，返回32字节摘要（曲线参数前缀的SM3状态由共享引擎缓存）"""
+    return CURVE_ENGINE.za_calculator.compute((public_key_x, public_key_y), user_id.encode('utf-8'))
 
 def generate_keypair():
     """生成SM2密钥对"""
@@ -106,11 +94,10 @@ def generate_keypair():
 
 def sign_message_with_k(d_key, message_text, user_id_str, public_key_coords, random_k):
     """使用指定的k值生成SM2签名。"""
-    za_bytes = bytes.fromhex(compute_user_hash(user_id_str, public_key_coords[0], public_key_coords[1]))
+    za_bytes = compute_user_hash(user_id_str, public_key_coords[0], public_key_coords[1])
     data_for_hash = za_bytes + message_text.encode('utf-8')
     
-    hash_result = sm3.sm3_hash(func.bytes_to_list(data_for_hash))
-    e_val = int(hash_result, 16)
+    e_val = int.from_bytes(sm3_hash(data_for_hash), 'big')
 
     # 标量乘法 R_point = k * G
     r_point = sm2_scalar_multiplication(random_k, BASE_POINT)
@@ -126,22 +113,15 @@ def sign_message_with_k(d_key, message_text, user_id_str, public_key_coords, ran
     return r_val, s_val
 
 def ecdsa_sign_for_poc(private_key_d, message_data, random_k_val):
-    """ECDSA签名，使用相同的SM2参数，用于POC验证"""
-    msg_bytes = message_data.encode('utf-8')
-    hash_output = sha256(msg_bytes).digest()
-    e_val_ecdsa = int.from_bytes(hash_output, 'big') % ORDER_N
-
-    r_point = sm2_scalar_multiplication(random_k_val, BASE_POINT)
-    r_val_ecdsa = r_point[0] % ORDER_N
-    if r_val_ecdsa == 0:
-        return None, None
-
-    inv_k = modular_inverse(random_k_val, ORDER_N)
-    s_val_ecdsa = (inv_k * (e_val_ecdsa + private_key_d * r_val_ecdsa)) % ORDER_N
-    if s_val_ecdsa == 0:
+    """ECDSA签名，使用相同的SM2参数，用于POC验证（批量签名/验签见 ECDSA_ENGINE）"""
+    signature = ECDSA_ENGINE.sign(message_data.encode('utf-8'), private_key_d, random_k_val)
+    if signature is None:
         return None, None
+    return signature
 
-    return r_val_ecdsa, s_val_ecdsa
+def ecdsa_verify_for_poc(public_key, message_data, signature):
+    """ECDSA验签，与 ecdsa_sign_for_poc 对应"""
+    return ECDSA_ENGINE.verify(message_data.encode('utf-8'), signature, public_key)
 
 def run_all_tests():
     """主函数，运行所有POC验证"""
@@ -238,6 +218,7 @@ def run_all_tests():
 
     ecdsa_msg = "ECDSA message"
     r1, s1 = ecdsa_sign_for_poc(shared_key_val, ecdsa_msg, k_reused_cross)
+    print(f"ECDSA签名验证: {ecdsa_verify_for_poc(shared_pub_key, ecdsa_msg, (r1, s1))}")
     
     sm2_msg = "SM2 message"
     r2, s2 = sign_message_with_k(shared_key_val, sm2_msg, "hybrid_user", shared_pub_key, k_reused_cross)
@@ -1,6 +1,14 @@
+import argparse
+import os
 import random
 import hashlib
-from typing import List, Tuple, Set, Dict
+import sys
+from typing import List, Tuple, Set, Dict, Union
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project5", "sm2"))
+from sm2_curve import CurveParams, SM2_RECOMMENDED
+from sm2_optimized import OptimizedSM2
+from sm3_backend import sm3_hash
 
 
 class Color:
@@ -64,13 +72,23 @@ def print_step(step_num: int, message: str):
 # 协议参数与基础工具函数
 # ------------------------------
 
-def init_protocol(p: int = None, g: int = None) -> Dict[str, int]:
-    """初始化协议参数"""
+def init_protocol(p: int = None, g: int = None, group: str = "modp") -> Dict[str, object]:
+    """初始化协议参数
+
+    group="modp": 乘法群 Z_p*（p、g 可指定，默认 p = 2^31 - 1，仅用于演示）；
+    group="ec": SM2推荐曲线上的素数阶椭圆曲线群（忽略 p、g），约128位安全强度，
+    每个元素一次256位标量乘法、传输33字节，远小于同等安全强度的3072位模幂与384字节元素。
+    """
+    if group == "ec":
+        ec_group = ECGroup()
+        return {"group": ec_group, "p": ec_group.p, "g": ec_group.g}
+    if group != "modp":
+        raise ValueError(f"未知的群类型: {group}")
     if p is None:
         p = 2147483647  # 大质数 (2^31 - 1)
     if g is None:
         g = 2  # 生成元
-    return {"p": p, "g": g}
+    return {"group": ModPGroup(p, g), "p": p, "g": g}
 
 def hash_to_group(identifier: str, p: int) -> int:
     """将标识符哈希到循环群元素"""
@@ -86,6 +104,109 @@ def generate_private_key(p: int) -> int:
     """生成私有密钥（群中的随机元素）"""
     return random.randint(1, p - 2)
 
+class ModPGroup:
+    """乘法群 Z_p*，元素为整数，传输时编码为定长大端字节串"""
+
+    name = "modp"
+
+    def __init__(self, p: int, g: int):
+        self.p = p
+        self.g = g
+        self.element_size = (p.bit_length() + 7) // 8
+
+    def describe(self) -> str:
+        return f"质数p = {self.p}, 生成元g = {self.g}"
+
+    def hash_to_group(self, identifier: str) -> int:
+        return hash_to_group(identifier, self.p)
+
+    def random_exponent(self) -> int:
+        return generate_private_key(self.p)
+
+    def exp(self, element: int, k: int) -> int:
+        return mod_pow(element, k, self.p)
+
+    def exp_many(self, elements: List[int], k: int) -> List[int]:
+        return [mod_pow(element, k, self.p) for element in elements]
+
+    def encode(self, element: int) -> bytes:
+        return element.to_bytes(self.element_size, 'big')
+
+    def decode(self, data: bytes) -> int:
+        if len(data) != self.element_size:
+            raise ValueError("群元素编码长度不正确")
+        element = int.from_bytes(data, 'big')
+        if not 0 < element < self.p:
+            raise ValueError("群元素超出范围")
+        return element
+
+    def formula(self, base: str, k: int, label: str) -> str:
+        return f"{base}^{k} mod {self.p}"
+
+    def short(self, element: int) -> str:
+        return f"{element:,}"[:8] + "..." if element > 1e8 else str(element)
+
+
+class ECGroup:
+    """SM2曲线上的素数阶椭圆曲线群（余因子为1），群运算写作乘法以与协议描述一致
+
+    H(v) 通过 try-and-increment 映射到曲线：x = SM3(域分隔串 || 计数器 || v) mod p，
+    x 不是某点的横坐标时计数器加一重试（期望2次），取y为偶数的点。
+    重试次数与标识符有关，计算时间会泄露少量信息，对时间侧信道敏感的场景应换用常数时间映射。
+    私有指数的点乘使用co-Z蒙哥马利阶梯，一轮内的所有结果共用一次模逆转换为仿射坐标；
+    元素以33字节SEC1压缩编码传输，接收方解码时校验点在曲线上。
+    """
+
+    name = "ec"
+    HASH_TO_CURVE_DST = b"DDH-PSI-SM2-H2C-v1"
+
+    def __init__(self, curve: CurveParams = SM2_RECOMMENDED):
+        self.curve = curve
+        self.engine = OptimizedSM2(curve=curve)
+        self.p = curve.p
+        self.n = curve.n
+        self.g = curve.generator
+        self.element_size = 1 + curve.coord_size
+
+    def describe(self) -> str:
+        return f"椭圆曲线 {self.curve.name}（群阶n为{self.n.bit_length()}位），元素压缩编码 {self.element_size} 字节"
+
+    def hash_to_group(self, identifier: str) -> Tuple[int, int]:
+        data = identifier.encode()
+        counter = 0
+        while True:
+            digest = sm3_hash(self.HASH_TO_CURVE_DST + counter.to_bytes(4, 'big') + data)
+            point = self.engine._lift_x(int.from_bytes(digest, 'big') % self.p)
+            if point is not None:
+                return point
+            counter += 1
+
+    def random_exponent(self) -> int:
+        return random.SystemRandom().randint(1, self.n - 1)
+
+    def exp(self, element: Tuple[int, int], k: int) -> Tuple[int, int]:
+        return self.engine.montgomery_ladder(k, element)
+
+    def exp_many(self, elements: List[Tuple[int, int]], k: int) -> List[Tuple[int, int]]:
+        engine = self.engine
+        return engine._batch_to_affine([engine._co_z_ladder_jacobian(k, element) for element in elements])
+
+    def encode(self, element: Tuple[int, int]) -> bytes:
+        return self.engine.encode_point(element, compressed=True)
+
+    def decode(self, data: bytes) -> Tuple[int, int]:
+        return self.engine.decode_point(data)
+
+    def formula(self, base: str, k: int, label: str) -> str:
+        return f"{base}^{label}"
+
+    def short(self, element: Tuple[int, int]) -> str:
+        return self.encode(element).hex()[:8] + "..."
+
+
+Group = Union[ModPGroup, ECGroup]
+
+
 # ------------------------------
 # 加法同态加密函数
 # ------------------------------
@@ -139,33 +260,32 @@ def he_add(c1: int, c2: int) -> Tuple[int, Dict]:
 # 参与方1的操作函数
 # ------------------------------
 
-def party1_round1(identifiers: Set[str], p: int, g: int) -> Tuple[List[int], int, Dict[str, int], List[Dict]]:
-    """参与方1第一轮操作"""
+def party1_round1(identifiers: Set[str], group: Group) -> Tuple[List[bytes], int, Dict[str, bytes], List[Dict]]:
+    """参与方1第一轮操作：发送编码后的 H(vi)^k1"""
     print_separator("参与方1 - 第一轮处理")
-    k1 = generate_private_key(p)
+    k1 = group.random_exponent()
     print_info(f"参与方1生成私有密钥: k1 = {k1}")
-    print_info(f"处理逻辑: 对每个标识符计算 H(vi)^k1 mod {p}")
+    print_info(f"处理逻辑: 对每个标识符计算 {group.formula('H(vi)', 'k1', 'k1')}")
+    
+    identifiers = list(identifiers)
+    hashed = [group.hash_to_group(iden) for iden in identifiers]
+    powered = group.exp_many(hashed, k1)
     
     mapped = {}
     result = []
     details = []
     
-    for iden in identifiers:
-        h = hash_to_group(iden, p)
-        val = mod_pow(h, k1, p)
-        mapped[iden] = val
-        
-        # 只显示哈希值的前8位，避免过长
-        h_short = f"{h:,}"[:8] + "..." if h > 1e8 else h
-        val_short = f"{val:,}"[:8] + "..." if val > 1e8 else val
+    for iden, h, val in zip(identifiers, hashed, powered):
+        encoded = group.encode(val)
+        mapped[iden] = encoded
         
         details.append({
             "标识符": iden,
-            "哈希值H(vi)": h_short,
-            "计算后H(vi)^k1": val_short,
-            "公式": f"H({iden})^{k1} mod {p}"
+            "哈希值H(vi)": group.short(h),
+            "计算后H(vi)^k1": group.short(val),
+            "公式": group.formula(f"H({iden})", k1, "k1")
         })
-        result.append(val)
+        result.append(encoded)
     
     # 打印处理详情表格
     headers = ["标识符", "哈希值H(vi)", "计算后H(vi)^k1", "公式"]
@@ -173,39 +293,39 @@ def party1_round1(identifiers: Set[str], p: int, g: int) -> Tuple[List[int], int
     print_table(headers, rows)
     
     random.shuffle(result)  # 打乱顺序保护隐私
-    print_info(f"打乱后发送给参与方2的数据: [{', '.join([f'{x:,}'[:6]+'...' for x in result[:3]])}, ...]")
+    print_info(f"打乱后发送给参与方2的数据: [{', '.join([x.hex()[:6]+'...' for x in result[:3]])}, ...]")
     return result, k1, mapped, details
 
-def party1_round3(round2_data: List[Tuple[int, int, Dict]], 
+def party1_round3(round2_data: List[Tuple[bytes, int, Dict]], 
                  k1: int, 
-                 p: int, 
-                 party1_mapped: Dict[str, int]) -> Tuple[int, List[Dict]]:
-    """参与方1第三轮操作: 计算交集并求和"""
+                 group: Group, 
+                 party1_double_masked: List[bytes]) -> Tuple[int, List[Dict]]:
+    """参与方1第三轮操作: 计算交集并求和
+    
+    party1_double_masked 为参与方2返回的 H(vi)^(k1*k2)（已打乱），
+    与参与方2的 H(wj)^k2 再乘上 k1 的结果比较即得到交集。
+    """
     print_separator("参与方1 - 第三轮处理")
     # 构建参与方1的元素集合
-    party1_elements = set(party1_mapped.values())
+    party1_elements = set(party1_double_masked)
     print_info(f"参与方1元素集合大小: {len(party1_elements)} 个元素")
     print_info(f"处理逻辑: 计算 H(wj)^(k1*k2) 并检查是否在本地集合中")
     
+    received = [group.decode(h_wj_k2) for h_wj_k2, _, _ in round2_data]
+    powered = group.exp_many(received, k1)
+    
     encrypted_sum = 0
     count = 0
     details = []
     sum_details = []
     
-    for idx, (h_wj_k2, enc_tj, enc_info) in enumerate(round2_data):
-        # 计算 H(wj)^(k1*k2)
-        h_wj_k1k2 = mod_pow(h_wj_k2, k1, p)
-        
-        # 显示简化的值
-        h_wj_k2_short = f"{h_wj_k2:,}"[:8] + "..." if h_wj_k2 > 1e8 else h_wj_k2
-        h_wj_k1k2_short = f"{h_wj_k1k2:,}"[:8] + "..." if h_wj_k1k2 > 1e8 else h_wj_k1k2
-        
-        # 检查是否在交集中
-        in_intersection = h_wj_k1k2 in party1_elements
+    for idx, ((_, enc_tj, enc_info), h_wj_k2, h_wj_k1k2) in enumerate(zip(round2_data, received, powered)):
+        # 检查 H(wj)^(k1*k2) 是否在交集中
+        in_intersection = group.encode(h_wj_k1k2) in party1_elements
         details.append({
             "序号": idx + 1,
-            "H(wj)^k2": h_wj_k2_short,
-            "计算后H(wj)^(k1*k2)": h_wj_k1k2_short,
+            "H(wj)^k2": group.short(h_wj_k2),
+            "计算后H(wj)^(k1*k2)": group.short(h_wj_k1k2),
             "是否在交集中": f"{Color.GREEN}是{Color.RESET}" if in_intersection else f"{Color.RED}否{Color.RESET}",
             "对应加密值": enc_info["密文"]
         })
@@ -246,26 +366,26 @@ def party1_round3(round2_data: List[Tuple[int, int, Dict]],
 # 参与方2的操作函数
 # ------------------------------
 
-def party2_round2(party1_data: List[int], 
+def party2_round2(party1_data: List[bytes], 
                  pairs: List[Tuple[str, int]], 
-                 p: int, g: int, 
-                 public_key: int) -> Tuple[List[Tuple[int, int, Dict]], int, List[Dict]]:
-    """参与方2第二轮操作"""
+                 group: Group, 
+                 public_key: int) -> Tuple[List[Tuple[bytes, int, Dict]], List[bytes], int, List[Dict]]:
+    """参与方2第二轮操作：返回打乱的 H(vi)^(k1*k2)，以及 H(wj)^k2 与加密的值"""
     print_separator("参与方2 - 第二轮处理")
-    k2 = generate_private_key(p)
+    k2 = group.random_exponent()
     print_info(f"参与方2生成私有密钥: k2 = {k2}")
-    print_info(f"处理逻辑1: 对参与方1的数据计算 H(vi)^(k1*k2) mod {p} (本地验证)")
-    print_info(f"处理逻辑2: 对自己的键值对计算 H(wj)^k2 mod {p} 并加密值")
+    print_info(f"处理逻辑1: 对参与方1的数据计算 {group.formula('H(vi)', '(k1*k2)', '(k1*k2)')} 并打乱后返回")
+    print_info(f"处理逻辑2: 对自己的键值对计算 {group.formula('H(wj)', 'k2', 'k2')} 并加密值")
     
-    # 处理参与方1的数据（仅本地验证，不传输）
+    # 处理参与方1的数据（解码时校验元素合法性）
+    received = [group.decode(h_vi_k1) for h_vi_k1 in party1_data]
+    double_masked = group.exp_many(received, k2)
     processed_p1 = []
-    for idx, h_vi_k1 in enumerate(party1_data[:3]):  # 只显示前3个
-        val = mod_pow(h_vi_k1, k2, p)
-        val_short = f"{val:,}"[:8] + "..." if val > 1e8 else val
+    for idx, (h_vi_k1, val) in enumerate(zip(received[:3], double_masked)):  # 只显示前3个
         processed_p1.append({
             "序号": idx + 1,
-            "接收值H(vi)^k1": f"{h_vi_k1:,}"[:8] + "...",
-            "计算后H(vi)^(k1*k2)": val_short
+            "接收值H(vi)^k1": group.short(h_vi_k1),
+            "计算后H(vi)^(k1*k2)": group.short(val)
         })
     
     # 打印参与方1数据处理表格
@@ -274,26 +394,25 @@ def party2_round2(party1_data: List[int],
     print("\n参与方1数据处理 (前3项):")
     print_table(headers_p1, rows_p1)
     
+    double_masked = [group.encode(val) for val in double_masked]
+    random.shuffle(double_masked)
+    
     # 处理参与方2自己的数据
+    hashed = [group.hash_to_group(wj) for wj, _ in pairs]
+    powered = group.exp_many(hashed, k2)
     result = []
     details = []
-    for wj, tj in pairs:
-        h_wj = hash_to_group(wj, p)
-        h_wj_k2 = mod_pow(h_wj, k2, p)
+    for (wj, tj), h_wj, h_wj_k2 in zip(pairs, hashed, powered):
         enc_tj, enc_info = he_encrypt(tj, public_key)
         
-        # 显示简化的值
-        h_wj_short = f"{h_wj:,}"[:8] + "..." if h_wj > 1e8 else h_wj
-        h_wj_k2_short = f"{h_wj_k2:,}"[:8] + "..." if h_wj_k2 > 1e8 else h_wj_k2
-        
         details.append({
             "标识符": wj,
             "值tj": tj,
-            "哈希值H(wj)": h_wj_short,
-            "计算后H(wj)^k2": h_wj_k2_short,
+            "哈希值H(wj)": group.short(h_wj),
+            "计算后H(wj)^k2": group.short(h_wj_k2),
             "加密值": enc_info["密文"]
         })
-        result.append((h_wj_k2, enc_tj, enc_info))
+        result.append((group.encode(h_wj_k2), enc_tj, enc_info))
     
     # 打印参与方2数据处理表格
     headers_p2 = ["标识符", "值tj", "哈希值H(wj)", "计算后H(wj)^k2", "加密值"]
@@ -302,8 +421,8 @@ def party2_round2(party1_data: List[int],
     print_table(headers_p2, rows_p2)
     
     random.shuffle(result)  # 打乱顺序保护隐私
-    print_info(f"打乱后发送给参与方1的数据: [{', '.join([f'({x[0]:,}'[:6]+'..., ...)' for x in result[:3]])}, ...]")
-    return result, k2, details
+    print_info(f"打乱后发送给参与方1的数据: [{', '.join(['(' + x[0].hex()[:6] + '..., ...)' for x in result[:3]])}, ...]")
+    return result, double_masked, k2, details
 
 # ------------------------------
 # 协议执行函数
@@ -311,13 +430,12 @@ def party2_round2(party1_data: List[int],
 
 def run_protocol(party1_ids: Set[str], 
                 party2_pairs: List[Tuple[str, int]], 
-                protocol_params: Dict[str, int]) -> int:
+                protocol_params: Dict[str, object]) -> int:
     """执行完整的私有交集求和协议，带优化可视化输出"""
-    p = protocol_params["p"]
-    g = protocol_params["g"]
+    group = protocol_params["group"]
     
     print_separator("协议初始化", Color.PURPLE)
-    print(f"{Color.BOLD}协议参数:{Color.RESET} 质数p = {p}, 生成元g = {g}")
+    print(f"{Color.BOLD}协议参数:{Color.RESET} {group.describe()}")
     print(f"{Color.BOLD}参与方1数据:{Color.RESET} {sorted(party1_ids)} (共{len(party1_ids)}个标识符)")
     print(f"{Color.BOLD}参与方2数据:{Color.RESET} {[f'({w},{t})' for w,t in party2_pairs]} (共{len(party2_pairs)}个键值对)")
     
@@ -336,15 +454,15 @@ def run_protocol(party1_ids: Set[str],
     
     # 步骤2: 参与方1执行第一轮操作
     print_step(2, "参与方1执行第一轮计算")
-    party1_data, k1, party1_mapped, party1_details = party1_round1(party1_ids, p, g)
+    party1_data, k1, party1_mapped, party1_details = party1_round1(party1_ids, group)
     
     # 步骤3: 参与方2执行第二轮操作
     print_step(3, "参与方2执行第二轮计算")
-    party2_data, k2, party2_details = party2_round2(party1_data, party2_pairs, p, g, he_pub)
+    party2_data, party1_double_masked, k2, party2_details = party2_round2(party1_data, party2_pairs, group, he_pub)
     
     # 步骤4: 参与方1执行第三轮操作
     print_step(4, "参与方1计算加密的交集和")
-    encrypted_sum, round3_details = party1_round3(party2_data, k1, p, party1_mapped)
+    encrypted_sum, round3_details = party1_round3(party2_data, k1, group, party1_double_masked)
     
     # 步骤5: 参与方2解密结果
     print_step(5, "参与方2解密最终结果")
@@ -353,6 +471,10 @@ def run_protocol(party1_ids: Set[str],
     decrypt_rows = [[str(decrypt_info[h]) for h in decrypt_headers]]
     print_table(decrypt_headers, decrypt_rows)
     
+    element_bytes = sum(len(x) for x in party1_data) + sum(len(x) for x in party1_double_masked)
+    element_bytes += sum(len(x[0]) for x in party2_data)
+    print_info(f"传输的群元素共 {element_bytes} 字节（每个元素 {group.element_size} 字节，不含同态密文）")
+    
     return final_sum
 
 # ------------------------------
@@ -360,10 +482,15 @@ def run_protocol(party1_ids: Set[str],
 # ------------------------------
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="基于DDH的私有交集求和协议")
+    parser.add_argument("--group", choices=("ec", "modp"), default="ec",
+                        help="ec: SM2曲线群（默认）；modp: 原 Z_p* 演示参数 p = 2^31 - 1")
+    args = parser.parse_args()
+    
     print(f"{Color.BOLD}=== 基于DDH的私有交集求和协议==={Color.RESET}")
     
     # 初始化协议参数
-    params = init_protocol()
+    params = init_protocol(group=args.group)
     
     # 参与方数据
     party1_identifiers = {"alice", "bob", "charlie", "david", "eve"}